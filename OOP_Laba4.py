@@ -1,5 +1,11 @@
+import json
+import sys
+import time
 from abc import ABC, abstractmethod
-from typing import List, Any
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
+from typing import List, Any, Dict, NamedTuple, Optional, Tuple
 
 
 # 1. Протокол слушателя изменений свойства
@@ -55,11 +61,120 @@ class INotifyDataChanging(ABC):
         pass
 
 
-# 6. Расширенный класс с валидацией изменений
+# 6. Журнал изменений свойств со снимками состояния
+class PropertyChange(NamedTuple):
+    sequence: int
+    property_name: str
+    old_value: Any
+    new_value: Any
+
+
+class ChangeJournal:
+    # Записи хранятся в кольцевом буфере ограниченного размера; при указании
+    # log_file каждая запись дописывается в компактный JSON-lines лог, поэтому
+    # вытесненные из памяти записи остаются доступными для воспроизведения.
+    def __init__(self, capacity: int = 10000, snapshot_interval: int = 1000,
+                 log_file: Optional[str] = None):
+        if capacity <= 0 or snapshot_interval <= 0:
+            raise ValueError("capacity and snapshot_interval must be positive")
+        self.capacity = capacity
+        self.snapshot_interval = snapshot_interval
+        self.sequence = 0
+        self._entries: deque = deque(maxlen=capacity)
+        # (номер, состояние, смещение в логе) в порядке возрастания номера
+        self._snapshots: List[Tuple[int, Dict[str, Any], int]] = []
+        self._snapshot_seqs: List[int] = []
+        self._log = open(log_file, 'ab+') if log_file else None
+
+    def record(self, property_name: str, old_value: Any, new_value: Any) -> PropertyChange:
+        self.sequence += 1
+        entry = PropertyChange(self.sequence, property_name, old_value, new_value)
+        self._entries.append(entry)
+        if self._log is not None:
+            line = json.dumps(entry, separators=(',', ':')) + '\n'
+            self._log.write(line.encode('utf-8'))
+        return entry
+
+    def snapshot_due(self) -> bool:
+        return self.sequence % self.snapshot_interval == 0
+
+    def add_snapshot(self, state: Dict[str, Any]) -> None:
+        offset = 0
+        if self._log is not None:
+            self._log.flush()
+            offset = self._log.tell()
+        self._snapshots.append((self.sequence, dict(state), offset))
+        self._snapshot_seqs.append(self.sequence)
+        if self._log is None:
+            self._prune_snapshots()
+
+    def _prune_snapshots(self) -> None:
+        # Без лога на диске снимки старше начала буфера бесполезны для
+        # воспроизведения — оставляем только последний из них.
+        if not self._entries:
+            return
+        first = self._entries[0].sequence
+        keep_from = bisect_right(self._snapshot_seqs, first - 1) - 1
+        if keep_from > 0:
+            del self._snapshots[:keep_from]
+            del self._snapshot_seqs[:keep_from]
+
+    def entries(self) -> List[PropertyChange]:
+        return list(self._entries)
+
+    def state_at(self, sequence: int) -> Dict[str, Any]:
+        if not 0 <= sequence <= self.sequence:
+            raise ValueError(f"Sequence {sequence} out of range [0, {self.sequence}]")
+        index = bisect_right(self._snapshot_seqs, sequence) - 1
+        if index < 0:
+            raise ValueError(f"No snapshot at or before sequence {sequence}")
+        snap_seq, snap_state, offset = self._snapshots[index]
+        state = dict(snap_state)
+        for entry in self._changes_between(snap_seq, sequence, offset):
+            state[entry.property_name] = entry.new_value
+        return state
+
+    def _changes_between(self, start: int, end: int, offset: int):
+        if start == end:
+            return []
+        first = self._entries[0].sequence if self._entries else self.sequence + 1
+        if first <= start + 1:
+            return islice(self._entries, start + 1 - first, end + 1 - first)
+        if self._log is None:
+            raise ValueError(f"Changes after sequence {start} were evicted from the journal")
+        return self._read_log(offset, end)
+
+    def _read_log(self, offset: int, end: int):
+        self._log.flush()
+        position = self._log.tell()
+        try:
+            self._log.seek(offset)
+            changes = []
+            for line in self._log:
+                entry = PropertyChange(*json.loads(line))
+                if entry.sequence > end:
+                    break
+                changes.append(entry)
+            return changes
+        finally:
+            self._log.seek(position)
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+# 7. Расширенный класс с валидацией изменений
 class ValidatableModel(ObservableModel, INotifyDataChanging):
+    # Свойства, состояние которых попадает в снимки журнала. Значения
+    # хранятся в атрибутах с префиксом "_" (name -> _name).
+    _journaled_properties: Tuple[str, ...] = ()
+
     def __init__(self):
         super().__init__()
         self._changing_listeners: List[IPropertyChangingListener] = []
+        self._journal: Optional[ChangeJournal] = None
 
     def add_property_changing_listener(self, listener: IPropertyChangingListener) -> None:
         self._changing_listeners.append(listener)
@@ -74,9 +189,48 @@ class ValidatableModel(ObservableModel, INotifyDataChanging):
                 return False
         return True
 
+    def enable_journal(self, journal: Optional[ChangeJournal] = None) -> ChangeJournal:
+        self._journal = journal if journal is not None else ChangeJournal()
+        self._journal.add_snapshot(self._journal_state())
+        return self._journal
+
+    def disable_journal(self) -> None:
+        self._journal = None
 
-# 7. Реализация демонстрационного класса
+    @property
+    def journal(self) -> Optional[ChangeJournal]:
+        return self._journal
+
+    def _record_change(self, property_name: str, old_value: Any, new_value: Any) -> None:
+        journal = self._journal
+        if journal is None:
+            return
+        journal.record(property_name, old_value, new_value)
+        if journal.snapshot_due():
+            journal.add_snapshot(self._journal_state())
+
+    def _journal_state(self) -> Dict[str, Any]:
+        return {name: getattr(self, '_' + name) for name in self._journaled_properties}
+
+    def restore(self, sequence: int) -> None:
+        # Восстановление состояния на момент sequence. Каждое изменённое свойство
+        # записывается в журнал как обычное изменение, чтобы state_at для
+        # последующих номеров совпадал с моделью.
+        if self._journal is None:
+            raise ValueError("Journal is not enabled")
+        state = self._journal.state_at(sequence)
+        for name, value in state.items():
+            old = getattr(self, '_' + name)
+            if old != value:
+                setattr(self, '_' + name, value)
+                self._record_change(name, old, value)
+                self._notify_property_changed(name)
+
+
+# 8. Реализация демонстрационного класса
 class Person(ValidatableModel):
+    _journaled_properties = ("name", "age")
+
     def __init__(self):
         super().__init__()
         self._name: str = ""
@@ -91,6 +245,7 @@ class Person(ValidatableModel):
         if self._validate_property_change("name", self._name, value):
             old = self._name
             self._name = value
+            self._record_change("name", old, value)
             self._notify_property_changed("name")
 
     @property
@@ -102,10 +257,11 @@ class Person(ValidatableModel):
         if self._validate_property_change("age", self._age, value):
             old = self._age
             self._age = value
+            self._record_change("age", old, value)
             self._notify_property_changed("age")
 
 
-# 8. Реализации слушателей и валидаторов
+# 9. Реализации слушателей и валидаторов
 class DataChangeLogger(IPropertyChangedListener):
     def on_property_changed(self, obj: Any, property_name: str) -> None:
         print(f"[Изменение] Свойство {property_name} объекта {type(obj).__name__} изменено")
@@ -129,7 +285,23 @@ class NameLengthValidator(IPropertyChangingListener):
         return True
 
 
-# 9. Демонстрация работы
+# 10. Замер накладных расходов журнала на одну установку свойства
+def benchmark_journal(count: int = 200000) -> None:
+    def measure(person: Person) -> float:
+        start = time.perf_counter()
+        for i in range(count):
+            person.age = i
+        return (time.perf_counter() - start) / count * 1e9
+
+    plain = measure(Person())
+    journaled_person = Person()
+    journaled_person.enable_journal(ChangeJournal(capacity=10000, snapshot_interval=1000))
+    journaled = measure(journaled_person)
+    print(f"Без журнала: {plain:.0f} нс/set, с журналом: {journaled:.0f} нс/set, "
+          f"накладные расходы: {journaled - plain:.0f} нс/set")
+
+
+# 11. Демонстрация работы
 if __name__ == "__main__":
     print("Создаем объект Person...")
     person = Person()
@@ -156,4 +328,18 @@ if __name__ == "__main__":
     person.age = 25
 
     print("\nТекущее состояние:")
-    print(f"Имя: {person.name}, Возраст: {person.age}")
\ No newline at end of file
+    print(f"Имя: {person.name}, Возраст: {person.age}")
+
+    print("\nЖурнал изменений и восстановление состояния:")
+    journal = person.enable_journal(ChangeJournal(capacity=100, snapshot_interval=2))
+    person.name = "Alicia"
+    person.age = 26
+    person.age = 27
+    for change in journal.entries():
+        print(f"  #{change.sequence}: {change.property_name} {change.old_value!r} -> {change.new_value!r}")
+    person.restore(1)
+    print(f"Состояние на шаге 1: Имя: {person.name}, Возраст: {person.age}")
+
+    if '--bench' in sys.argv:
+        print("\nЗамер накладных расходов журнала:")
+        benchmark_journal()
@@ -1,12 +1,42 @@
+import heapq
 import json
-from dataclasses import dataclass, field
-from typing import Protocol, Sequence, Optional, TypeVar, Generic, List, Dict, Any
+import multiprocessing
+import operator
+import subprocess
+import os
+import queue
+import re
+import secrets
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence as SequenceABC
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from dataclasses import MISSING, astuple, dataclass, field, fields, replace
+from itertools import chain, islice
+from enum import Enum
+from typing import Protocol, Sequence, Optional, TypeVar, Generic, List, Dict, Any, Iterable, Iterator, IO, \
+    Tuple, Union, get_args, get_origin, get_type_hints
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 T = TypeVar('T')
 
 
 # 1. Класс User
-@dataclass(order=True)
+@dataclass(order=True, slots=True)
 class User:
     id: int
     name: str
@@ -21,6 +51,12 @@ class IDataRepository(Protocol[T]):
     def get_all(self) -> Sequence[T]:
         ...
 
+    def iter_all(self) -> Iterator[T]:
+        ...
+
+    def get_page(self, offset: int, limit: int) -> Sequence[T]:
+        ...
+
     def get_by_id(self, id: int) -> Optional[T]:
         ...
 
@@ -40,56 +76,1115 @@ class IUserRepository(IDataRepository[User], Protocol):
 
 
 # 3. Реализация DataRepository с JSON
+class DuplicateKeyError(ValueError):
+    def __init__(self, field_name: str, value: Any):
+        super().__init__(f"Duplicate value {value!r} for unique field '{field_name}'")
+        self.field_name = field_name
+        self.value = value
+
+
+_compact_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+class ConcurrencyError(ValueError):
+    def __init__(self, key: Any, expected: int, actual: Optional[int]):
+        super().__init__(f"Item {key!r} was modified concurrently: expected version {expected}, found {actual}")
+        self.key = key
+        self.expected = expected
+        self.actual = actual
+
+
+# Межпроцессная рекомендательная блокировка на отдельном файле. В начале
+# файла хранится номер поколения данных: писатель увеличивает его под
+# блокировкой, а читатель по нему дёшево узнаёт, что данные изменились.
+class FileLock:
+    _LOCK_OFFSET = 64  # на Windows блокируется байт за номером поколения
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __enter__(self) -> 'FileLock':
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, self._LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, self._LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def read_generation(self) -> int:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        data = os.read(self._fd, 20).strip()
+        return int(data) if data else 0
+
+    def write_generation(self, generation: int) -> None:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, b'%20d' % generation)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+# Схемный двоичный кодек для записей-словарей. Файл начинается с заголовка
+# со схемой (имя, тип, допустимость None для каждого поля), далее записи:
+# битовая карта None-полей, блок фиксированного размера (числа и длины строк)
+# и байты строк подряд — блок разбирается одним вызовом struct.unpack_from.
+# Поля читаются по имени, поэтому файл со старой схемой (без новых полей)
+# загружается со значениями по умолчанию, а неизвестные поля пропускаются.
+class BinaryCodec:
+    MAGIC = b'BREC'
+    _HEADER = struct.Struct('<4sHH')
+    _FIELD = struct.Struct('<BBH')
+    _FORMATS = {int: 'q', float: 'd', bool: '?', str: 'I', bytes: 'I'}
+    _TYPE_CODES = {int: 1, float: 2, bool: 3, str: 4, bytes: 5}
+    _CODE_TYPES = {code: kind for kind, code in _TYPE_CODES.items()}
+
+    def __init__(self, schema: Sequence[Tuple[str, type, bool]], version: int = 1,
+                 defaults: Optional[Dict[str, Any]] = None):
+        for name, kind, nullable in schema:
+            if kind not in self._TYPE_CODES:
+                raise TypeError(f"Unsupported field type for '{name}': {kind!r}")
+        self.schema = tuple(schema)
+        self.version = version
+        self.defaults = dict(defaults or {})
+        self._fixed = self._fixed_struct([kind for _, kind, _ in self.schema])
+
+    @classmethod
+    def _fixed_struct(cls, kinds: Sequence[type]) -> struct.Struct:
+        return struct.Struct('<' + ''.join(cls._FORMATS[kind] for kind in kinds))
+
+    @classmethod
+    def for_dataclass(cls, dataclass_type: type, version: int = 1) -> 'BinaryCodec':
+        hints = get_type_hints(dataclass_type)
+        schema = []
+        defaults = {}
+        for dataclass_field in fields(dataclass_type):
+            kind = hints[dataclass_field.name]
+            # Optional[X] — это typing.Union, а запись X | None — types.UnionType
+            nullable = get_origin(kind) in (Union, types.UnionType) and type(None) in get_args(kind)
+            if nullable:
+                kind = next(arg for arg in get_args(kind) if arg is not type(None))
+            schema.append((dataclass_field.name, kind, nullable))
+            if dataclass_field.default is not MISSING:
+                defaults[dataclass_field.name] = dataclass_field.default
+        return cls(schema, version, defaults)
+
+    def extended(self, name: str, kind: type, nullable: bool = True, default: Any = None) -> 'BinaryCodec':
+        return BinaryCodec(self.schema + ((name, kind, nullable),), self.version,
+                           {**self.defaults, name: default})
+
+    def _encode_header(self) -> bytes:
+        parts = [self._HEADER.pack(self.MAGIC, self.version, len(self.schema))]
+        for name, kind, nullable in self.schema:
+            encoded_name = name.encode('utf-8')
+            parts.append(self._FIELD.pack(self._TYPE_CODES[kind], nullable, len(encoded_name)))
+            parts.append(encoded_name)
+        return b''.join(parts)
+
+    def encode(self, record: Dict[str, Any]) -> bytes:
+        nulls = 0
+        fixed = []
+        variable = []
+        for i, (name, kind, nullable) in enumerate(self.schema):
+            value = record.get(name)
+            if value is None:
+                if not nullable:
+                    raise ValueError(f"Field '{name}' must not be None")
+                nulls |= 1 << i
+                fixed.append(0)
+            elif kind is str or kind is bytes:
+                data = value.encode('utf-8') if kind is str else value
+                fixed.append(len(data))
+                variable.append(data)
+            else:
+                fixed.append(value)
+        return nulls.to_bytes((len(self.schema) + 7) // 8, 'little') + self._fixed.pack(*fixed) + b''.join(variable)
+
+    def write(self, f: IO[bytes], records: Iterable[Dict[str, Any]]) -> None:
+        f.write(self._encode_header())
+        encode = self.encode
+        f.write(b''.join(encode(record) for record in records))
+
+    @staticmethod
+    def _read_exact(f: IO[bytes], size: int) -> bytes:
+        data = f.read(size)
+        if len(data) < size:
+            raise ValueError("Truncated binary record file")
+        return data
+
+    def _read_schema(self, f: IO[bytes]) -> Optional[List[tuple]]:
+        header = f.read(self._HEADER.size)
+        if not header:
+            return None
+        if len(header) < self._HEADER.size or header[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError("Not a binary record file")
+        _, version, count = self._HEADER.unpack(header)
+        if version > self.version:
+            raise ValueError(f"Unsupported schema version {version}")
+        file_schema = []
+        for _ in range(count):
+            code, nullable, name_length = self._FIELD.unpack(self._read_exact(f, self._FIELD.size))
+            name = self._read_exact(f, name_length).decode('utf-8')
+            file_schema.append((name, self._CODE_TYPES[code]))
+        return file_schema
+
+    def read(self, f: IO[bytes], chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+        # Записи разбираются из буфера ограниченного размера, как в
+        # _iter_json_array: в памяти держится только текущий фрагмент файла
+        file_schema = self._read_schema(f)
+        if file_schema is None:
+            return
+        known = {name for name, _, _ in self.schema}
+        defaults = {name: self.defaults.get(name) for name, _, _ in self.schema}
+        bitmap_size = (len(file_schema) + 7) // 8
+        fixed = self._fixed_struct([kind for _, kind in file_schema])
+        numbers = [(i, name) for i, (name, kind) in enumerate(file_schema)
+                   if kind not in (str, bytes) and name in known]
+        variables = [(i, name if name in known else None, kind is str)
+                     for i, (name, kind) in enumerate(file_schema) if kind in (str, bytes)]
+        nullable = [(i, name) for i, (name, kind) in enumerate(file_schema) if name in known]
+        # Длины строк фиксированного блока без остальных полей (пропуск байтов 'x')
+        lengths = struct.Struct('<' + ''.join(
+            self._FORMATS[kind] if kind in (str, bytes) else f'{struct.calcsize(self._FORMATS[kind])}x'
+            for _, kind in file_schema))
+        head_size = bitmap_size + fixed.size
+        data = b''
+        position = end_of_data = 0
+        while True:
+            if end_of_data - position < head_size:
+                data = data[position:] + f.read(max(chunk_size, head_size))
+                position = 0
+                end_of_data = len(data)
+                if not data:
+                    return
+                if end_of_data < head_size:
+                    raise ValueError("Truncated binary record file")
+            # Запись целиком (с байтами строк) должна поместиться в буфер
+            size = head_size + sum(lengths.unpack_from(data, position + bitmap_size))
+            if end_of_data - position < size:
+                data = data[position:] + f.read(max(chunk_size, size))
+                position = 0
+                end_of_data = len(data)
+                if end_of_data < size:
+                    raise ValueError("Truncated binary record file")
+            values = fixed.unpack_from(data, position + bitmap_size)
+            nulls = int.from_bytes(data[position:position + bitmap_size], 'little')
+            position += head_size
+            record = defaults.copy()
+            for i, name in numbers:
+                record[name] = values[i]
+            for i, name, is_str in variables:
+                end = position + values[i]
+                if name is not None:
+                    record[name] = data[position:end].decode('utf-8') if is_str else data[position:end]
+                position = end
+            if nulls:
+                for i, name in nullable:
+                    if nulls >> i & 1:
+                        record[name] = None
+            yield record
+
+
+class StorageMode(Enum):
+    SNAPSHOT = 1  # весь файл перезаписывается при каждом изменении
+    LOG = 2       # изменения дописываются в журнал, файл — периодический снимок
+
+
+# Представление списка только для чтения: срезы не копируют элементы.
+# Как и итератор словаря, представление становится недействительным, если
+# владелец (owner._mutations) добавил или удалил элементы после его создания.
+class ReadOnlyView(SequenceABC, Generic[T]):
+    __slots__ = ('_items', '_start', '_stop', '_owner', '_mutations')
+
+    def __init__(self, items: List[T], start: int = 0, stop: Optional[int] = None,
+                 owner: Any = None, mutations: Optional[int] = None):
+        self._items = items
+        self._start = start
+        self._stop = stop
+        self._owner = owner
+        self._mutations = owner._mutations if mutations is None and owner is not None else mutations
+
+    def _check(self) -> None:
+        if self._owner is not None and self._owner._mutations != self._mutations:
+            raise RuntimeError("repository changed after the view was created")
+
+    def _bounds(self) -> range:
+        self._check()
+        stop = len(self._items) if self._stop is None else min(self._stop, len(self._items))
+        return range(min(self._start, stop), stop)
+
+    def __len__(self) -> int:
+        return len(self._bounds())
+
+    def __getitem__(self, index):
+        bounds = self._bounds()
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("ReadOnlyView slices do not support a step")
+            window = bounds[index]
+            return ReadOnlyView(self._items, window.start, window.stop, self._owner, self._mutations)
+        return self._items[bounds[index]]
+
+    def __iter__(self) -> Iterator[T]:
+        bounds = self._bounds()
+        if self._owner is None:
+            items = self._items
+            if bounds.start == 0 and bounds.stop == len(items):
+                return iter(items)
+            return (items[i] for i in bounds)
+        return self._iter_checked(bounds)
+
+    def _iter_checked(self, bounds: range) -> Iterator[T]:
+        items = self._items
+        for i in bounds:
+            self._check()
+            yield items[i]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, SequenceABC) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyView({list(self)!r})"
+
+
+# Метка удалённого элемента: позиции остальных не сдвигаются до _compact_items
+_DELETED = object()
+
+_WHITESPACE = re.compile(r'\s*')
+_WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+
+def _iter_json_array(f: IO[str], chunk_size: int = 1 << 16) -> Iterator[Any]:
+    # Потоковый разбор JSON-массива: в памяти держится только текущий фрагмент
+    # файла, а элементы отдаются по одному сразу после разбора.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    skip = _WHITESPACE
+
+    while True:
+        position = skip.match(buffer, position).end()
+        if position < len(buffer):
+            if skip is _WHITESPACE:
+                if buffer[position] != '[':
+                    raise ValueError("Expected a JSON array")
+                skip = _WHITESPACE_AND_COMMAS
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Значение, упирающееся в конец буфера, может быть обрезано (числа)
+                if end < len(buffer) or eof:
+                    yield value
+                    position = end
+                    continue
+        elif eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+        buffer += chunk
+
+
+# Вторичные индексы хранят первичные ключи; значение None в SortedIndex
+# держится отдельно, так как не сравнивается с остальными значениями.
+class IndexKind(Enum):
+    HASH = 1
+    SORTED = 2
+
+
+class HashIndex:
+    kind = IndexKind.HASH
+
+    def __init__(self):
+        self._buckets: Dict[Any, set] = {}
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def add(self, value: Any, key: Any) -> None:
+        self._buckets.setdefault(value, set()).add(key)
+
+    def build(self, pairs: Iterable[tuple]) -> None:
+        self.clear()
+        for value, key in pairs:
+            self.add(value, key)
+
+    def remove(self, value: Any, key: Any) -> None:
+        bucket = self._buckets.get(value)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[value]
+
+    def lookup(self, value: Any) -> set:
+        return self._buckets.get(value, set())
+
+
+class SortedIndex:
+    kind = IndexKind.SORTED
+
+    def __init__(self):
+        self._values: List[Any] = []
+        self._keys: List[Any] = []
+        self._none_keys: set = set()
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._keys.clear()
+        self._none_keys.clear()
+
+    def add(self, value: Any, key: Any) -> None:
+        if value is None:
+            self._none_keys.add(key)
+            return
+        position = bisect_right(self._values, value)
+        self._values.insert(position, value)
+        self._keys.insert(position, key)
+
+    def build(self, pairs: Iterable[tuple]) -> None:
+        # Одна сортировка вместо n вставок в середину списка (O(n log n) против O(n²));
+        # сортировка устойчива, поэтому равные значения идут в порядке добавления
+        self.clear()
+        ordered = []
+        for value, key in pairs:
+            if value is None:
+                self._none_keys.add(key)
+            else:
+                ordered.append((value, key))
+        ordered.sort(key=operator.itemgetter(0))
+        self._values = [value for value, _ in ordered]
+        self._keys = [key for _, key in ordered]
+
+    def remove(self, value: Any, key: Any) -> None:
+        if value is None:
+            self._none_keys.discard(key)
+            return
+        for position in range(bisect_left(self._values, value), bisect_right(self._values, value)):
+            if self._keys[position] == key:
+                del self._values[position]
+                del self._keys[position]
+                return
+
+    def bounds(self, low: Any = None, high: Any = None, include_low: bool = True,
+               include_high: bool = True) -> range:
+        start = 0 if low is None else \
+            (bisect_left if include_low else bisect_right)(self._values, low)
+        stop = len(self._values) if high is None else \
+            (bisect_right if include_high else bisect_left)(self._values, high)
+        return range(start, max(start, stop))
+
+    def prefix_bounds(self, prefix: str) -> range:
+        start = bisect_left(self._values, prefix)
+        stop = bisect_left(self._values, prefix + '\U0010ffff')
+        return range(start, stop)
+
+    def keys(self, bounds: range, descending: bool = False, with_none: bool = False) -> Iterator[Any]:
+        ordered = (self._keys[i] for i in (reversed(bounds) if descending else bounds))
+        return chain(ordered, self._none_keys) if with_none else ordered
+
+
 class JsonDataRepository(Generic[T]):
-    def __init__(self, filename: str, from_dict: callable, to_dict: callable):
+    # Первичный ключ (key_field) и уникальные поля (unique_fields) индексируются
+    # в памяти: индексы строятся в _load и поддерживаются при add/update/delete.
+    # У каждой записи есть номер версии (_version в файле) для оптимистичных
+    # блокировок. При multiprocess=True запись идёт под файловой блокировкой,
+    # а перед чтением файл перечитывается, если он изменился (inode/mtime/size).
+    def __init__(self, filename: str, from_dict: callable, to_dict: callable,
+                 key_field: str = 'id', unique_fields: Sequence[str] = (),
+                 storage: StorageMode = StorageMode.SNAPSHOT, compact_threshold: int = 10000,
+                 fsync: bool = False, multiprocess: bool = False, codec: Optional[BinaryCodec] = None):
+        if multiprocess and storage is not StorageMode.SNAPSHOT:
+            raise ValueError("multiprocess access is only supported with StorageMode.SNAPSHOT")
         self.filename = filename
         self.from_dict = from_dict
         self.to_dict = to_dict
+        self.key_field = key_field
+        self.unique_fields = tuple(unique_fields)
+        self.storage = storage
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.multiprocess = multiprocess
+        # Двоичный формат вместо JSON; номер версии записи хранится как поле схемы
+        self.codec = codec.extended('_version', int, default=1) if codec is not None else None
+        self.log_filename = filename + '.log'
+        self.lock_filename = filename + '.lock'
         self.items: List[T] = []
+        # Счётчик добавлений и удалений: по нему ReadOnlyView замечает изменения
+        self._mutations = 0
+        self._first_deleted: Optional[int] = None
+        self._versions: Dict[Any, int] = {}
+        self._stamp: Optional[tuple] = None
+        self._file_lock = FileLock(self.lock_filename) if multiprocess else None
+        self._positions: Dict[Any, int] = {}
+        self._unique_indexes: Dict[str, Dict[Any, Any]] = {name: {} for name in self.unique_fields}
+        self._secondary_indexes: Dict[str, Any] = {}
+        # Значения индексируемых полей на момент индексации: get_by_id отдаёт
+        # сам хранимый объект, и его поля могут измениться до вызова update
+        self._indexed: Dict[Any, Dict[str, Any]] = {}
+        self._log_file = None
+        self._log_records = 0
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
         self._load()
 
     def _load(self):
+        self._stamp = self._file_stamp()
+        self._mutations += 1
+        self._first_deleted = None
+        self.items = []
+        self._versions = {}
         try:
+            for record in self._read_records():
+                version = record.pop('_version', 1)
+                item = self.from_dict(record)
+                self.items.append(item)
+                self._versions[getattr(item, self.key_field)] = version
+        except FileNotFoundError:
+            pass
+        self._rebuild_indexes()
+        if self.storage is StorageMode.LOG:
+            self._open_log()
+
+    def _read_records(self) -> Iterator[Dict[str, Any]]:
+        if self.codec is not None:
+            with open(self.filename, 'rb') as f:
+                yield from self.codec.read(f)
+        else:
             with open(self.filename, 'r') as f:
-                data = json.load(f)
-                self.items = [self.from_dict(item) for item in data]
+                yield from _iter_json_array(f)
+
+    def _file_stamp(self) -> Optional[tuple]:
+        # inode/mtime/size ловят запись в обход блокировки, но inode может
+        # переиспользоваться, а mtime грубый — поэтому учитываем и поколение
+        generation = self._file_lock.read_generation() if self._file_lock is not None else 0
+        try:
+            stat = os.stat(self.filename)
         except FileNotFoundError:
-            self.items = []
+            return generation, None
+        return generation, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> bool:
+        if self._file_stamp() == self._stamp:
+            return False
+        self._load()
+        return True
+
+    def get_version(self, id: Any) -> Optional[int]:
+        # Без refresh: версия относится к уже прочитанному состоянию записи
+        return self._versions.get(id)
+
+    def _rebuild_indexes(self) -> None:
+        self._positions = {}
+        self._indexed = {}
+        self._unique_indexes = {name: {} for name in self.unique_fields}
+        secondary, self._secondary_indexes = self._secondary_indexes, {}
+        for position, item in enumerate(self.items):
+            self._check_unique(item)
+            self._positions[getattr(item, self.key_field)] = position
+            self._index_add(item)
+        # Вторичные индексы строятся целиком после уникальных
+        for field_name, index in secondary.items():
+            self._build_index(field_name, index)
+
+    def _build_index(self, field_name: str, index: Any) -> None:
+        pairs = []
+        for item in self.items:
+            key = getattr(item, self.key_field)
+            value = self._indexed[key][field_name] = getattr(item, field_name)
+            pairs.append((value, key))
+        index.build(pairs)
+        self._secondary_indexes[field_name] = index
+
+    def _check_unique(self, item: T, replacing: bool = False) -> None:
+        key = getattr(item, self.key_field)
+        if not replacing and key in self._positions:
+            raise DuplicateKeyError(self.key_field, key)
+        for name, index in self._unique_indexes.items():
+            value = getattr(item, name)
+            if value is None:
+                continue
+            existing = index.get(value, key)
+            if existing != key:
+                raise DuplicateKeyError(name, value)
+
+    def _index_add(self, item: T) -> None:
+        key = getattr(item, self.key_field)
+        indexed = self._indexed[key] = {}
+        for name, index in self._unique_indexes.items():
+            value = indexed[name] = getattr(item, name)
+            if value is not None:
+                index[value] = key
+        for name, index in self._secondary_indexes.items():
+            value = indexed[name] = getattr(item, name)
+            index.add(value, key)
+
+    def _index_remove(self, key: Any) -> None:
+        indexed = self._indexed.pop(key)
+        for name, index in self._unique_indexes.items():
+            value = indexed[name]
+            if value is not None:
+                index.pop(value, None)
+        for name, index in self._secondary_indexes.items():
+            index.remove(indexed[name], key)
+
+    def create_index(self, field_name: str, kind: IndexKind = IndexKind.HASH) -> None:
+        self._build_index(field_name, SortedIndex() if kind is IndexKind.SORTED else HashIndex())
+
+    def drop_index(self, field_name: str) -> None:
+        del self._secondary_indexes[field_name]
+        if field_name not in self.unique_fields:
+            for indexed in self._indexed.values():
+                indexed.pop(field_name, None)
+
+    def query(self) -> 'Query[T]':
+        if self.multiprocess:
+            self.refresh()
+        return Query(self)
+
+    def _find_unique(self, field_name: str, value: Any) -> Optional[T]:
+        if self.multiprocess:
+            self.refresh()
+        key = self._unique_indexes[field_name].get(value)
+        return self.items[self._positions[key]] if key is not None else None
+
+    # Изменения в памяти без записи на диск
+    def _apply_add(self, item: T, version: int = 1) -> None:
+        self._check_unique(item)
+        self._mutations += 1
+        self._versions[getattr(item, self.key_field)] = version
+        self._positions[getattr(item, self.key_field)] = len(self.items)
+        self.items.append(item)
+        self._index_add(item)
+
+    def _apply_update(self, item: T, version: Optional[int] = None) -> None:
+        key = getattr(item, self.key_field)
+        position = self._positions[key]
+        self._check_unique(item, replacing=True)
+        self._versions[key] = self._versions.get(key, 0) + 1 if version is None else version
+        self._index_remove(key)
+        self.items[position] = item
+        self._index_add(item)
+
+    def _apply_delete(self, key: Any) -> None:
+        # Элемент только помечается: пачка удалений сжимается одним проходом
+        position = self._positions.pop(key)
+        self._mutations += 1
+        self._versions.pop(key, None)
+        self._index_remove(key)
+        self.items[position] = _DELETED
+        if self._first_deleted is None or position < self._first_deleted:
+            self._first_deleted = position
+
+    def _restore(self, item: T, position: int, version: int) -> None:
+        # Откат удаления до сжатия: позиция элемента ещё свободна
+        key = getattr(item, self.key_field)
+        self._mutations += 1
+        self.items[position] = item
+        self._positions[key] = position
+        self._versions[key] = version
+        self._index_add(item)
+
+    def _compact_items(self) -> None:
+        start = self._first_deleted
+        if start is None:
+            return
+        self._first_deleted = None
+        self.items[start:] = [item for item in islice(self.items, start, None) if item is not _DELETED]
+        # Сдвигаем позиции элементов, стоявших после удалённых
+        for i in range(start, len(self.items)):
+            self._positions[getattr(self.items[i], self.key_field)] = i
+
+    def _live_items(self) -> List[T]:
+        if self._first_deleted is None:
+            return self.items
+        return [item for item in self.items if item is not _DELETED]
+
+    def _commit(self, operations: List[tuple], expected: Optional[Dict[Any, int]] = None) -> None:
+        if not self.multiprocess:
+            self._apply_operations(operations, expected or {})
+            return
+        with self._file_lock:
+            # Под блокировкой применяем изменения к актуальному состоянию файла
+            self.refresh()
+            self._apply_operations(operations, expected or {})
+            self._file_lock.write_generation(self._stamp[0] + 1)
+            self._stamp = self._file_stamp()
+
+    def _apply_operations(self, operations: List[tuple], expected: Dict[Any, int]) -> None:
+        # Все операции применяются в памяти и сохраняются одной записью;
+        # при любой ошибке уже применённые изменения откатываются.
+        undo = []
+        try:
+            for op, item in operations:
+                key = getattr(item, self.key_field)
+                position = self._positions.get(key)
+                version = self._versions.get(key)
+                if key in expected and expected[key] != version:
+                    raise ConcurrencyError(key, expected[key], version)
+                if op == 'add':
+                    self._apply_add(item)
+                    undo.append(('delete', key, None, None))
+                elif op == 'update':
+                    if position is None:
+                        raise ValueError("Item not found")
+                    previous = self.items[position]
+                    self._apply_update(item)
+                    undo.append(('update', previous, None, version))
+                elif op == 'delete':
+                    if position is None or self.items[position] != item:
+                        raise ValueError("Item not found")
+                    undo.append(('restore', self.items[position], position, version))
+                    self._apply_delete(key)
+                else:
+                    raise ValueError(f"Unknown operation: {op}")
+            if operations:
+                self._persist(operations)
+        except BaseException:
+            for op, value, position, version in reversed(undo):
+                if op == 'delete':
+                    self._apply_delete(value)
+                elif op == 'update':
+                    self._apply_update(value, version)
+                else:
+                    self._restore(value, position, version)
+            raise
+        finally:
+            self._compact_items()
+
+    def _persist(self, operations: List[tuple]) -> None:
+        if self.storage is StorageMode.LOG:
+            self._append_log(operations)
+        else:
+            self._save()
+
+    def _to_record(self, item: T, versions: Dict[Any, int]) -> Dict[str, Any]:
+        record = self.to_dict(item)
+        record['_version'] = versions.get(getattr(item, self.key_field), 1)
+        return record
 
     def _save(self):
-        with open(self.filename, 'w') as f:
-            data = [self.to_dict(item) for item in self.items]
-            json.dump(data, f, indent=4)
+        # Запись во временный файл и атомарная замена: читатели видят либо
+        # старую, либо новую версию файла целиком
+        tmp_name = f'{self.filename}.{os.getpid()}.tmp'
+        if self.codec is not None:
+            with open(tmp_name, 'wb') as f:
+                self.codec.write(f, (self._to_record(item, self._versions) for item in self._live_items()))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_name, self.filename)
+            return
+        # По записи на строку: json.dump с indent работает на чистом Python
+        # и на больших файлах в разы медленнее C-кодировщика.
+        rows = ',\n    '.join(_compact_encode(self._to_record(item, self._versions)) for item in self._live_items())
+        with open(tmp_name, 'w') as f:
+            f.write(f'[\n    {rows}\n]' if rows else '[]')
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, self.filename)
+
+    # Журнал изменений: строка "<crc32> <json>\n" на каждую пачку операций
+    # (одиночное изменение или commit сессии). Оборванная или повреждённая
+    # строка в конце журнала отбрасывается при загрузке целиком.
+    def _encode_batch(self, records) -> bytes:
+        batch = [[op, getattr(item, self.key_field) if op == 'delete' else self.to_dict(item)]
+                 for op, item in records]
+        payload = _compact_encode(batch).encode('utf-8')
+        return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+    def _replay_log(self, path: str) -> int:
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return 0
+        count = 0
+        valid_end = 0
+        with f:
+            for line in f:
+                payload = line[9:-1]
+                if not line.endswith(b'\n') or line[8:9] != b' ' \
+                        or line[:8] != b'%08x' % zlib.crc32(payload):
+                    break
+                for op, value in json.loads(payload):
+                    if op == 'delete':
+                        if value in self._positions:
+                            self._apply_delete(value)
+                    else:
+                        # Повтор операций идемпотентен: add/update работают как upsert
+                        item = self.from_dict(value)
+                        if getattr(item, self.key_field) in self._positions:
+                            self._apply_update(item)
+                        else:
+                            self._apply_add(item)
+                    count += 1
+                valid_end += len(line)
+            f.truncate(valid_end)
+        self._compact_items()
+        return count
+
+    def _open_log(self) -> None:
+        # .log.1 остаётся только если процесс упал во время уплотнения.
+        # Пустой .tmp создаётся до ротации журнала и исчезает при os.replace
+        # снимка, поэтому без .tmp журнал .log.1 уже учтён в основном файле.
+        pending = self.log_filename + '.1'
+        tmp_name = self.filename + '.tmp'
+        if os.path.exists(pending):
+            if os.path.exists(tmp_name):
+                self._replay_log(pending)
+                self._write_snapshot(list(self.items), dict(self._versions))
+            else:
+                os.remove(pending)
+        elif os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        self._log_records = self._replay_log(self.log_filename)
+        self._log_file = open(self.log_filename, 'ab')
+
+    def _append_log(self, records) -> None:
+        data = self._encode_batch(records)
+        with self._lock:
+            end = self._log_file.tell()
+            try:
+                self._log_file.write(data)
+                self._log_file.flush()
+                if self.fsync:
+                    os.fsync(self._log_file.fileno())
+            except BaseException:
+                # Не оставляем в журнале частично записанную пачку
+                self._log_file.truncate(end)
+                raise
+            self._log_records += len(records)
+        if self._log_records >= self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self) -> Optional[threading.Thread]:
+        if self._compactor is not None and self._compactor.is_alive():
+            return None
+        with self._lock:
+            items = list(self._live_items())
+            versions = dict(self._versions)
+            self._log_file.close()
+            open(self.filename + '.tmp', 'wb').close()
+            os.replace(self.log_filename, self.log_filename + '.1')
+            self._log_file = open(self.log_filename, 'ab')
+            self._log_records = 0
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(items, versions), daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def _write_snapshot(self, items: List[T], versions: Dict[Any, int]) -> None:
+        tmp_name = self.filename + '.tmp'
+        with open(tmp_name, 'wb' if self.codec is not None else 'w') as f:
+            if self.codec is not None:
+                self.codec.write(f, (self._to_record(item, versions) for item in items))
+            else:
+                f.write(_compact_encode([self._to_record(item, versions) for item in items]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, self.filename)
+        os.remove(self.log_filename + '.1')
+
+    def compact(self) -> None:
+        if self.storage is not StorageMode.LOG:
+            return
+        if self._compactor is not None:
+            self._compactor.join()
+        compactor = self._start_compaction()
+        if compactor is not None:
+            compactor.join()
+
+    def close(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        if self._file_lock is not None:
+            self._file_lock.close()
+            self._file_lock = None
 
     def get_all(self) -> Sequence[T]:
-        return self.items.copy()
+        if self.multiprocess:
+            self.refresh()
+        return ReadOnlyView(self.items, owner=self)
+
+    def iter_all(self) -> Iterator[T]:
+        if self.multiprocess:
+            self.refresh()
+        return iter(ReadOnlyView(self.items, owner=self))
+
+    def get_page(self, offset: int, limit: int) -> Sequence[T]:
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must be non-negative")
+        if self.multiprocess:
+            self.refresh()
+        return ReadOnlyView(self.items, offset, offset + limit, owner=self)
 
     def get_by_id(self, id: int) -> Optional[T]:
-        return next((item for item in self.items if getattr(item, 'id') == id), None)
+        if self.multiprocess:
+            self.refresh()
+        position = self._positions.get(id)
+        return self.items[position] if position is not None else None
 
     def add(self, item: T) -> None:
-        self.items.append(item)
-        self._save()
+        self._commit([('add', item)])
 
-    def update(self, item: T) -> None:
-        for i, existing in enumerate(self.items):
-            if getattr(existing, 'id') == getattr(item, 'id'):
-                self.items[i] = item
-                self._save()
-                return
-        raise ValueError("Item not found")
+    def update(self, item: T, expected_version: Optional[int] = None) -> None:
+        key = getattr(item, self.key_field)
+        self._commit([('update', item)], None if expected_version is None else {key: expected_version})
 
-    def delete(self, item: T) -> None:
-        if item in self.items:
-            self.items.remove(item)
-            self._save()
+    def delete(self, item: T, expected_version: Optional[int] = None) -> None:
+        key = getattr(item, self.key_field)
+        self._commit([('delete', item)], None if expected_version is None else {key: expected_version})
+
+    def session(self) -> 'RepositorySession[T]':
+        return RepositorySession(self)
+
+    def add_many(self, items: Iterable[T]) -> None:
+        with self.session() as session:
+            for item in items:
+                session.add(item)
+
+    def update_many(self, items: Iterable[T]) -> None:
+        with self.session() as session:
+            for item in items:
+                session.update(item)
+
+    def delete_many(self, items: Iterable[T]) -> None:
+        with self.session() as session:
+            for item in items:
+                session.delete(item)
+
+
+# Единица работы: накапливает изменения и применяет их одной записью в commit()
+class RepositorySession(Generic[T]):
+    def __init__(self, repository: JsonDataRepository[T]):
+        self.repository = repository
+        self._operations: List[tuple] = []
+        self._expected: Dict[Any, int] = {}
+
+    def _expect(self, item: T, expected_version: Optional[int]) -> None:
+        if expected_version is not None:
+            self._expected[getattr(item, self.repository.key_field)] = expected_version
+
+    def add(self, item: T) -> None:
+        self._operations.append(('add', item))
+
+    def update(self, item: T, expected_version: Optional[int] = None) -> None:
+        self._expect(item, expected_version)
+        self._operations.append(('update', item))
+
+    def delete(self, item: T, expected_version: Optional[int] = None) -> None:
+        self._expect(item, expected_version)
+        self._operations.append(('delete', item))
+
+    def commit(self) -> None:
+        operations, self._operations = self._operations, []
+        expected, self._expected = self._expected, {}
+        self.repository._commit(operations, expected)
+
+    def rollback(self) -> None:
+        self._operations = []
+        self._expected = {}
+
+    def __enter__(self) -> 'RepositorySession[T]':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+_QUERY_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'startswith': lambda value, prefix: value.startswith(prefix),
+}
+_RANGE_OPERATORS = ('<', '<=', '>', '>=')
+
+
+@dataclass
+class QueryPlan:
+    access: str
+    index: Optional[str]
+    estimated_rows: int
+    filters: List[str]
+    order: str
+    limit: Optional[int]
+    offset: int
+
+    def __str__(self) -> str:
+        lines = [f"access: {self.access}" + (f" ({self.index})" if self.index else ""),
+                 f"estimated rows: {self.estimated_rows}"]
+        if self.filters:
+            lines.append("filter: " + " AND ".join(self.filters))
+        lines.append(f"order: {self.order}")
+        if self.limit is not None or self.offset:
+            lines.append(f"offset: {self.offset}, limit: {self.limit}")
+        return "\n".join(lines)
+
+
+# Построитель запросов с простым планировщиком: из доступных путей доступа
+# (первичный ключ, уникальный индекс, вторичные индексы, полный перебор)
+# выбирается тот, что даёт меньше всего строк-кандидатов.
+class Query(Generic[T]):
+    def __init__(self, repository: JsonDataRepository[T]):
+        self.repository = repository
+        self._predicates: List[tuple] = []
+        self._order_field: Optional[str] = None
+        self._descending = False
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    def where(self, field_name: str, op: str, value: Any) -> 'Query[T]':
+        if op not in _QUERY_OPERATORS:
+            raise ValueError(f"Unknown operator: {op}")
+        self._predicates.append((field_name, op, value))
+        return self
+
+    def order_by(self, field_name: str, descending: bool = False) -> 'Query[T]':
+        self._order_field = field_name
+        self._descending = descending
+        return self
+
+    def limit(self, count: int) -> 'Query[T]':
+        self._limit = count
+        return self
+
+    def offset(self, count: int) -> 'Query[T]':
+        self._offset = count
+        return self
+
+    def _access_paths(self):
+        # (число строк, путь доступа, индекс, функция, возвращающая ключи)
+        repo = self.repository
+        yield len(repo.items), 'full scan', None, None
+        ranges: Dict[str, Dict[str, Any]] = {}
+        for field_name, op, value in self._predicates:
+            if op == '==' and field_name == repo.key_field:
+                keys = [value] if value in repo._positions else []
+                yield len(keys), 'primary key lookup', field_name, lambda keys=keys: keys
+            elif op == '==' and field_name in repo._unique_indexes and value is not None:
+                key = repo._unique_indexes[field_name].get(value)
+                keys = [key] if key is not None else []
+                yield len(keys), 'unique index lookup', field_name, lambda keys=keys: keys
+            index = repo._secondary_indexes.get(field_name)
+            if index is None or value is None:
+                continue
+            if op == '==' and index.kind is IndexKind.HASH:
+                keys = index.lookup(value)
+                yield len(keys), 'hash index lookup', field_name, lambda keys=keys: keys
+            elif index.kind is IndexKind.SORTED and op == '==':
+                ranges.setdefault(field_name, {}).update(low=value, high=value)
+            elif index.kind is IndexKind.SORTED and op in _RANGE_OPERATORS:
+                bound = ranges.setdefault(field_name, {})
+                if op in ('>', '>='):
+                    bound.update(low=value, include_low=op == '>=')
+                else:
+                    bound.update(high=value, include_high=op == '<=')
+            elif index.kind is IndexKind.SORTED and op == 'startswith':
+                bounds = index.prefix_bounds(value)
+                yield len(bounds), 'sorted index prefix scan', field_name, bounds
+        for field_name, bound in ranges.items():
+            bounds = self.repository._secondary_indexes[field_name].bounds(**bound)
+            yield len(bounds), 'sorted index range scan', field_name, bounds
+
+    def _plan(self):
+        paths = list(self._access_paths())
+        rows, access, index_name, source = min(paths, key=lambda path: path[0])
+        order = 'none'
+        if self._order_field is not None:
+            order_index = self.repository._secondary_indexes.get(self._order_field)
+            order = 'sort'
+            if isinstance(source, range) and index_name == self._order_field:
+                order = 'index'
+            elif access == 'full scan' and order_index is not None and order_index.kind is IndexKind.SORTED:
+                # Обход упорядоченного индекса позволяет остановиться после limit строк
+                access, index_name, source, order = 'sorted index scan', self._order_field, \
+                    order_index.bounds(), 'index'
+        filters = [f"{field_name} {op} {value!r}" for field_name, op, value in self._predicates]
+        plan = QueryPlan(access, index_name, rows, filters, order, self._limit, self._offset)
+        return plan, source
+
+    def explain(self) -> QueryPlan:
+        return self._plan()[0]
+
+    def __iter__(self) -> Iterator[T]:
+        plan, source = self._plan()
+        repo = self.repository
+        if source is None:
+            candidates = iter(repo.items)
         else:
-            raise ValueError("Item not found")
+            if isinstance(source, range):
+                index = repo._secondary_indexes[plan.index]
+                descending = self._descending and plan.order == 'index'
+                keys = index.keys(source, descending, with_none=plan.access == 'sorted index scan')
+            else:
+                keys = source()
+            candidates = (repo.items[repo._positions[key]] for key in keys)
+        matches = (item for item in candidates if self._matches(item))
+
+        stop = None if self._limit is None else self._offset + self._limit
+        if plan.order == 'sort':
+            field_name = self._order_field
+            matches = list(matches)
+            present = [item for item in matches if getattr(item, field_name) is not None]
+            missing = [item for item in matches if getattr(item, field_name) is None]
+            sort_key = operator.attrgetter(field_name)
+            if stop is not None and stop < len(present):
+                select = heapq.nlargest if self._descending else heapq.nsmallest
+                present = select(stop, present, key=sort_key)
+            else:
+                present.sort(key=sort_key, reverse=self._descending)
+            matches = iter(present + missing)
+        return islice(matches, self._offset, stop)
+
+    def _matches(self, item: T) -> bool:
+        for field_name, op, value in self._predicates:
+            actual = getattr(item, field_name)
+            if actual is None and op not in ('==', '!='):
+                return False
+            if not _QUERY_OPERATORS[op](actual, value):
+                return False
+        return True
+
+    def all(self) -> List[T]:
+        return list(self)
+
+    def first(self) -> Optional[T]:
+        return next(iter(self), None)
 
 
 # 4. Реализация UserRepository
 class UserRepository(JsonDataRepository[User], IUserRepository):
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, storage: StorageMode = StorageMode.SNAPSHOT,
+                 compact_threshold: int = 10000, multiprocess: bool = False,
+                 codec: Optional[BinaryCodec] = None):
         super().__init__(
             filename,
             from_dict=lambda d: User(
@@ -107,14 +1202,182 @@ class UserRepository(JsonDataRepository[User], IUserRepository):
                 'password': u.password,
                 'email': u.email,
                 'address': u.address
-            }
+            },
+            unique_fields=('login',),
+            storage=storage,
+            compact_threshold=compact_threshold,
+            multiprocess=multiprocess,
+            codec=codec
         )
 
     def get_by_login(self, login: str) -> Optional[User]:
-        return next((user for user in self.items if user.login == login), None)
+        return self._find_unique('login', login)
+
+
+# 5. Пул соединений SQLite
+class SqliteConnectionPool:
+    # База ':memory:' (и временная '') у каждого соединения своя, поэтому в
+    # пуле допустимы только файлы и URI вида file:name?mode=memory&cache=shared
+    def __init__(self, database: str, size: int = 4, timeout: float = 30.0):
+        if database in (':memory:', ''):
+            raise ValueError("Pooled SQLite connections need a file or a shared-cache URI, "
+                             "not a private in-memory database")
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.database, check_same_thread=False,
+                                     uri=self.database.startswith('file:'))
+        # WAL позволяет читателям работать параллельно с писателем
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free SQLite connection within {self.timeout} s") from None
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
 
+# 6. Реализация UserRepository на SQLite
+class SqliteUserRepository(IUserRepository):
+    _COLUMNS = 'id, name, login, password, email, address'
+    _SELECT_ALL = f'SELECT {_COLUMNS} FROM users ORDER BY rowid'
+    _SELECT_PAGE = f'SELECT {_COLUMNS} FROM users ORDER BY rowid LIMIT ? OFFSET ?'
+    _SELECT_AFTER = f'SELECT {_COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?'
+    _ITER_PAGE_SIZE = 1000
+    _SELECT_BY_ID = f'SELECT {_COLUMNS} FROM users WHERE id = ?'
+    _SELECT_BY_LOGIN = f'SELECT {_COLUMNS} FROM users WHERE login = ?'
+    _INSERT = f'INSERT INTO users ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)'
+    _UPDATE = 'UPDATE users SET name = ?, login = ?, password = ?, email = ?, address = ? WHERE id = ?'
+    _DELETE = 'DELETE FROM users WHERE id = ?'
 
-# 5. Протокол AuthService
+    def __init__(self, database: str, pool_size: int = 4, timeout: float = 30.0):
+        self.pool = SqliteConnectionPool(database, pool_size, timeout)
+        with self.pool.connection() as connection, connection:
+            # id — INTEGER PRIMARY KEY (псевдоним rowid), login — уникальный индекс
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'id INTEGER PRIMARY KEY, name TEXT NOT NULL, login TEXT NOT NULL UNIQUE, '
+                'password TEXT NOT NULL, email TEXT, address TEXT)'
+            )
+
+    @staticmethod
+    def _to_row(user: User) -> tuple:
+        return astuple(user)
+
+    @staticmethod
+    def _duplicate_error(error: sqlite3.IntegrityError, user: User) -> DuplicateKeyError:
+        # Сообщение SQLite: "UNIQUE constraint failed: users.login"
+        field_name = str(error).rsplit('.', 1)[-1]
+        if field_name not in ('id', 'login'):
+            field_name = 'id'
+        return DuplicateKeyError(field_name, getattr(user, field_name))
+
+    def get_all(self) -> Sequence[User]:
+        with self.pool.connection() as connection:
+            return [User(*row) for row in connection.execute(self._SELECT_ALL)]
+
+    def iter_all(self) -> Iterator[User]:
+        # Страницами по первичному ключу: между страницами соединение
+        # возвращается в пул, и незаконченный перебор его не удерживает
+        last_id = -1 << 63
+        while True:
+            with self.pool.connection() as connection:
+                rows = connection.execute(self._SELECT_AFTER, (last_id, self._ITER_PAGE_SIZE)).fetchall()
+            for row in rows:
+                yield User(*row)
+            if len(rows) < self._ITER_PAGE_SIZE:
+                return
+            last_id = rows[-1][0]
+
+    def get_page(self, offset: int, limit: int) -> Sequence[User]:
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must be non-negative")
+        with self.pool.connection() as connection:
+            rows = connection.execute(self._SELECT_PAGE, (limit, offset)).fetchall()
+        return [User(*row) for row in rows]
+
+    def get_by_id(self, id: int) -> Optional[User]:
+        with self.pool.connection() as connection:
+            row = connection.execute(self._SELECT_BY_ID, (id,)).fetchone()
+        return User(*row) if row else None
+
+    def get_by_login(self, login: str) -> Optional[User]:
+        with self.pool.connection() as connection:
+            row = connection.execute(self._SELECT_BY_LOGIN, (login,)).fetchone()
+        return User(*row) if row else None
+
+    def add(self, item: User) -> None:
+        self.add_many([item])
+
+    def update(self, item: User) -> None:
+        self.update_many([item])
+
+    def delete(self, item: User) -> None:
+        self.delete_many([item])
+
+    def add_many(self, items: Iterable[User]) -> None:
+        with self.pool.connection() as connection, connection:
+            for item in items:
+                try:
+                    connection.execute(self._INSERT, self._to_row(item))
+                except sqlite3.IntegrityError as error:
+                    raise self._duplicate_error(error, item) from error
+
+    def update_many(self, items: Iterable[User]) -> None:
+        with self.pool.connection() as connection, connection:
+            for item in items:
+                row = self._to_row(item)
+                try:
+                    cursor = connection.execute(self._UPDATE, row[1:] + row[:1])
+                except sqlite3.IntegrityError as error:
+                    raise self._duplicate_error(error, item) from error
+                if cursor.rowcount == 0:
+                    raise ValueError("Item not found")
+
+    def delete_many(self, items: Iterable[User]) -> None:
+        with self.pool.connection() as connection, connection:
+            for item in items:
+                row = connection.execute(self._SELECT_BY_ID, (item.id,)).fetchone()
+                if row is None or User(*row) != item:
+                    raise ValueError("Item not found")
+                connection.execute(self._DELETE, (item.id,))
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+# 7. Протокол AuthService
 class IAuthService(Protocol):
     def sign_in(self, user: User) -> None:
         ...
@@ -131,7 +1394,7 @@ class IAuthService(Protocol):
         ...
 
 
-# 6. Реализация AuthService
+# 8. Реализация AuthService
 class FileAuthService(IAuthService):
     def __init__(self, user_repo: IUserRepository, auth_file: str = 'auth.json'):
         self.user_repo = user_repo
@@ -173,7 +1436,462 @@ class FileAuthService(IAuthService):
         return self._current_user
 
 
-# 7. Демонстрация работы
+# 9. Хранилище сессий с TTL и LRU-вытеснением
+class Session:
+    __slots__ = ('user_id', 'expires_at', 'user', 'version')
+
+    def __init__(self, user_id: int, expires_at: float, user: Optional[User] = None):
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.user = user
+        # Версия записи пользователя, для которой действителен кэш user
+        self.version: Optional[int] = None
+
+
+class SessionStore:
+    # Сессии лежат в OrderedDict в порядке последнего обращения; так как срок
+    # жизни продлевается при каждом обращении, истёкшие сессии всегда в начале.
+    # На диск хранилище пишется целиком, но не чаще раза в flush_interval секунд.
+    def __init__(self, filename: Optional[str] = None, ttl: float = 3600.0,
+                 max_sessions: int = 100_000, flush_interval: float = 5.0, clock: callable = time.time):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._dirty = False
+        self._last_flush = clock()
+        self._load()
+
+    def _load(self) -> None:
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        now = self.clock()
+        for token, (user_id, expires_at) in sorted((data or {}).items(), key=lambda entry: entry[1][1]):
+            if expires_at > now:
+                self._sessions[token] = Session(user_id, expires_at)
+
+    def flush(self) -> None:
+        self._last_flush = self.clock()
+        if self.filename is None or not self._dirty:
+            return
+        data = {token: [session.user_id, session.expires_at] for token, session in self._sessions.items()}
+        tmp_name = self.filename + '.tmp'
+        with open(tmp_name, 'w') as f:
+            f.write(_compact_encode(data))
+        os.replace(tmp_name, self.filename)
+        self._dirty = False
+
+    def _touch(self) -> None:
+        self._dirty = True
+        if self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def purge_expired(self) -> int:
+        now = self.clock()
+        purged = 0
+        while self._sessions:
+            token, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[token]
+            purged += 1
+        if purged:
+            self._dirty = True
+        return purged
+
+    def create(self, user: User) -> str:
+        self.purge_expired()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+        token = secrets.token_urlsafe(16)
+        self._sessions[token] = Session(user.id, self.clock() + self.ttl, user)
+        self._touch()
+        return token
+
+    def get(self, token: str) -> Optional[Session]:
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        now = self.clock()
+        if session.expires_at <= now:
+            del self._sessions[token]
+            self._touch()
+            return None
+        session.expires_at = now + self.ttl
+        self._sessions.move_to_end(token)
+        self._touch()
+        return session
+
+    def remove(self, token: str) -> None:
+        if self._sessions.pop(token, None) is not None:
+            self._touch()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# 10. AuthService с множеством одновременных сессий
+class SessionAuthService(IAuthService):
+    def __init__(self, user_repo: IUserRepository, store: Optional[SessionStore] = None):
+        self.user_repo = user_repo
+        self.store = store if store is not None else SessionStore()
+        self.token: Optional[str] = None
+
+    def create_session(self, user: User) -> str:
+        return self.store.create(user)
+
+    def _user_version(self, user_id: int) -> Optional[int]:
+        # Версии записей есть только у JsonDataRepository; для остальных
+        # репозиториев кэш не используется и пользователь читается каждый раз
+        if not isinstance(self.user_repo, JsonDataRepository):
+            return None
+        if self.user_repo.multiprocess:
+            self.user_repo.refresh()
+        return self.user_repo.get_version(user_id)
+
+    def resolve(self, token: str) -> Optional[User]:
+        session = self.store.get(token)
+        if session is None:
+            return None
+        # Кэш пользователя сбрасывается, если запись изменили или удалили
+        version = self._user_version(session.user_id)
+        if session.user is None or version is None or version != session.version:
+            session.user = self.user_repo.get_by_id(session.user_id)
+            session.version = version
+        if session.user is None:
+            self.store.remove(token)
+        return session.user
+
+    def end_session(self, token: str) -> None:
+        self.store.remove(token)
+
+    def sign_in(self, user: User) -> None:
+        self.token = self.create_session(user)
+
+    def sign_out(self) -> None:
+        if self.token is not None:
+            self.end_session(self.token)
+            self.token = None
+
+    @property
+    def is_authorized(self) -> bool:
+        return self.token is not None and self.resolve(self.token) is not None
+
+    @property
+    def current_user(self) -> User:
+        user = self.resolve(self.token) if self.token is not None else None
+        if user is None:
+            raise ValueError("User not authorized")
+        return user
+
+
+# 11. Замеры производительности
+def benchmark_lookups(sizes: Sequence[int] = (1_000, 100_000, 1_000_000), lookups: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            repo = UserRepository(os.path.join(tmp, f'users_{size}.json'))
+            repo.items = [User(id=i, name=f"User{i}", login=f"user{i}", password="x")
+                          for i in range(size)]
+            repo._rebuild_indexes()
+            step = max(size // lookups, 1)
+            keys = [(i * step) % size for i in range(lookups)]
+            start = time.perf_counter()
+            for key in keys:
+                repo.get_by_id(key)
+            by_id = (time.perf_counter() - start) / lookups * 1e9
+            logins = [f"user{key}" for key in keys]
+            start = time.perf_counter()
+            for login in logins:
+                repo.get_by_login(login)
+            by_login = (time.perf_counter() - start) / lookups * 1e9
+            print(f"{size:>10} пользователей: get_by_id {by_id:.0f} нс, get_by_login {by_login:.0f} нс")
+
+
+def benchmark_inserts(count: int = 100_000, snapshot_count: int = 1_000) -> None:
+    # Режим SNAPSHOT квадратичен по числу вставок, поэтому он замеряется на
+    # snapshot_count записях, а время для count записей оценивается как c*n^2.
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = UserRepository(os.path.join(tmp, 'snapshot.json'))
+        start = time.perf_counter()
+        for i in range(snapshot_count):
+            repo.add(User(id=i, name=f"User{i}", login=f"user{i}", password="x"))
+        snapshot_time = time.perf_counter() - start
+        estimated = snapshot_time * (count / snapshot_count) ** 2
+
+        repo = UserRepository(os.path.join(tmp, 'log.json'), storage=StorageMode.LOG)
+        start = time.perf_counter()
+        for i in range(count):
+            repo.add(User(id=i, name=f"User{i}", login=f"user{i}", password="x"))
+        log_time = time.perf_counter() - start
+        repo.close()
+
+        start = time.perf_counter()
+        reloaded = UserRepository(os.path.join(tmp, 'log.json'), storage=StorageMode.LOG)
+        load_time = time.perf_counter() - start
+        reloaded.close()
+        print(f"SNAPSHOT: {snapshot_count} вставок за {snapshot_time:.2f} с "
+              f"(оценка для {count}: {estimated:.0f} с)")
+        print(f"LOG: {count} вставок за {log_time:.2f} с, загрузка {len(reloaded.items)} записей "
+              f"за {load_time:.2f} с")
+
+
+def benchmark_bulk_import(count: int = 1_000_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in (StorageMode.SNAPSHOT, StorageMode.LOG):
+            repo = UserRepository(os.path.join(tmp, f'{storage.name.lower()}.json'), storage=storage,
+                                  compact_threshold=count * 2)
+            users = [User(id=i, name=f"User{i}", login=f"user{i}", password="x") for i in range(count)]
+            start = time.perf_counter()
+            repo.add_many(users)
+            elapsed = time.perf_counter() - start
+            repo.close()
+            print(f"{storage.name}: add_many {count} пользователей за {elapsed:.2f} с")
+
+
+def _measure_open(path: str, sqlite: bool, count: int, lookups: int) -> None:
+    # Запускается в отдельном процессе: пиковый RSS учитывает и память самой
+    # SQLite (кэш страниц, разбор запросов), которую tracemalloc не видит
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    repo = SqliteUserRepository(path) if sqlite else UserRepository(path)
+    load_time = time.perf_counter() - start
+    step = max(count // lookups, 1)
+    keys = [(i * step) % count for i in range(lookups)]
+    start = time.perf_counter()
+    for key in keys:
+        repo.get_by_id(key)
+        repo.get_by_login(f"user{key}")
+    lookup_time = (time.perf_counter() - start) / lookups * 1e6
+    peak = _peak_rss_mb() - baseline
+    repo.close()
+    print(f"{load_time:.2f} {peak:.1f} {lookup_time:.1f}")
+
+
+def benchmark_sqlite(count: int = 500_000, lookups: int = 20_000) -> None:
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        users = [User(id=i, name=f"User{i}", login=f"user{i}", password="x") for i in range(count)]
+        json_path = os.path.join(tmp, 'users.json')
+        sqlite_path = os.path.join(tmp, 'users.db')
+        seed = UserRepository(json_path)
+        seed.add_many(users)
+        seed = SqliteUserRepository(sqlite_path)
+        seed.add_many(users)
+        seed.close()
+        del users, seed
+
+        for name, path, sqlite in (('JSON', json_path, False), ('SQLite', sqlite_path, True)):
+            load_time, peak, lookup_time = subprocess.run(
+                [sys.executable, '-c',
+                 f'import OOP_Laba5; OOP_Laba5._measure_open({path!r}, {sqlite}, {count}, {lookups})'],
+                cwd=module_dir, capture_output=True, text=True, check=True
+            ).stdout.split()
+            print(f"{name}: открытие {load_time} с, прирост пикового RSS {peak} МБ, "
+                  f"get_by_id+get_by_login {lookup_time} мкс")
+
+
+def _measure_load(path: str, streaming: bool) -> None:
+    # Запускается в отдельном процессе, чтобы пиковый RSS не смешивался
+    start = time.perf_counter()
+    if streaming:
+        repo = UserRepository(path)
+    else:
+        repo = UserRepository(path + '.missing')
+        with open(path, 'r') as f:
+            data = json.load(f)
+        repo.items = [repo.from_dict(item) for item in data]
+        del data
+        repo._rebuild_indexes()
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.2f} {_peak_rss_mb():.0f}")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss наследуется через exec от родителя, поэтому на Linux берём VmHWM.
+    # Модуля resource нет в Windows, поэтому он импортируется только здесь.
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmHWM')) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    # ru_maxrss в macOS измеряется в байтах, в остальных системах — в КБ
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20 if sys.platform == 'darwin' else 1024)
+
+
+def benchmark_streaming_load(count: int = 1_000_000, calls: int = 100) -> None:
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.json')
+        repo = UserRepository(path)
+        repo.add_many(User(id=i, name=f"User{i}", login=f"user{i}", password="x") for i in range(count))
+        for name, streaming in (('json.load', False), ('потоковый', True)):
+            output = subprocess.run(
+                [sys.executable, '-c', f'import OOP_Laba5; OOP_Laba5._measure_load({path!r}, {streaming})'],
+                cwd=module_dir, capture_output=True, text=True, check=True
+            ).stdout.split()
+            print(f"{name}: загрузка {count} записей {output[0]} с, пиковый RSS {output[1]} МБ")
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            repo.items.copy()
+        copy_time = (time.perf_counter() - start) / calls * 1e3
+        start = time.perf_counter()
+        for _ in range(calls):
+            repo.get_all()
+            repo.get_page(count // 2, 50)
+        view_time = (time.perf_counter() - start) / calls * 1e3
+        print(f"Копия списка: {copy_time:.3f} мс/вызов, get_all+get_page: {view_time:.3f} мс/вызов")
+
+
+def benchmark_queries(count: int = 200_000, runs: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = UserRepository(os.path.join(tmp, 'users.json'))
+        repo.items = [User(id=i, name=f"User{i % 1000:04d}", login=f"user{i}", password="x",
+                           email=f"user{i}@example.com" if i % 3 else None) for i in range(count)]
+        repo._rebuild_indexes()
+
+        def run(query_factory):
+            start = time.perf_counter()
+            for _ in range(runs):
+                query_factory().all()
+            return (time.perf_counter() - start) / runs * 1e3
+
+        queries = {
+            'email ==': lambda: repo.query().where('email', '==', 'user5@example.com'),
+            'name prefix + order + limit': lambda: repo.query().where('name', 'startswith', 'User00')
+                .order_by('name').limit(10),
+            'order by name limit 10': lambda: repo.query().order_by('name').limit(10),
+        }
+        before = {name: run(factory) for name, factory in queries.items()}
+        repo.create_index('email', IndexKind.HASH)
+        repo.create_index('name', IndexKind.SORTED)
+        for name, factory in queries.items():
+            after = run(factory)
+            print(f"{name}: без индексов {before[name]:.2f} мс, с индексами {after:.3f} мс "
+                  f"[{factory().explain().access}]")
+
+
+def benchmark_sessions(count: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = UserRepository(os.path.join(tmp, 'users.json'))
+        # Через add_many: у записей есть версии, и resolve использует кэш сессии
+        repo.add_many(User(id=i, name=f"User{i}", login=f"user{i}", password="x") for i in range(count))
+        store = SessionStore(os.path.join(tmp, 'sessions.json'), max_sessions=count)
+        service = SessionAuthService(repo, store)
+
+        start = time.perf_counter()
+        tokens = [service.create_session(user) for user in repo.items]
+        create_time = (time.perf_counter() - start) / count * 1e6
+        # Первый resolve загружает пользователя, повторный берёт его из кэша сессии
+        start = time.perf_counter()
+        for token in reversed(tokens):
+            service.resolve(token)
+        first_time = (time.perf_counter() - start) / count * 1e6
+        start = time.perf_counter()
+        for token in tokens:
+            service.resolve(token)
+        resolve_time = (time.perf_counter() - start) / count * 1e6
+        start = time.perf_counter()
+        store.flush()
+        flush_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reloaded = SessionAuthService(repo, SessionStore(os.path.join(tmp, 'sessions.json'), max_sessions=count))
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for token in tokens:
+            reloaded.resolve(token)
+        cold_time = (time.perf_counter() - start) / count * 1e6
+        print(f"{count} сессий: создание {create_time:.1f} мкс, первый resolve {first_time:.2f} мкс, "
+              f"повторный resolve {resolve_time:.2f} мкс, "
+              f"flush {flush_time:.2f} с, загрузка {load_time:.2f} с, первый resolve после загрузки "
+              f"{cold_time:.2f} мкс")
+
+
+def _contention_worker(path: str, worker: int, count: int) -> None:
+    repo = UserRepository(path, multiprocess=True)
+    for i in range(count):
+        repo.add(User(id=1000 + worker * count + i, name=f"Worker{worker}", login=f"w{worker}_{i}", password="x"))
+        # Инкремент общего счётчика с повтором при конфликте версий
+        while True:
+            counter = repo.get_by_id(0)
+            version = repo.get_version(0)
+            try:
+                repo.update(replace(counter, name=str(int(counter.name) + 1)), expected_version=version)
+                break
+            except ConcurrencyError:
+                continue
+    repo.close()
+
+
+def benchmark_contention(workers: int = 4, count: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.json')
+        UserRepository(path).add(User(id=0, name="0", login="counter", password="x"))
+        processes = [multiprocessing.Process(target=_contention_worker, args=(path, worker, count))
+                     for worker in range(workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        repo = UserRepository(path)
+        operations = workers * count * 2
+        print(f"{workers} процессов: {operations} записей за {elapsed:.2f} с "
+              f"({operations / elapsed:.0f} оп/с), записей {len(repo.items) - 1} из {workers * count}, "
+              f"счётчик {repo.get_by_id(0).name} из {workers * count}")
+
+
+def benchmark_binary_codec(count: int = 200_000) -> None:
+    users = [User(id=i, name=f"User{i}", login=f"user{i}", password="secret",
+                  email=f"user{i}@example.com" if i % 2 else None) for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, codec in (('JSON', None), ('binary', BinaryCodec.for_dataclass(User))):
+            path = os.path.join(tmp, f'users.{name}')
+            repo = UserRepository(path, codec=codec)
+            repo.items = list(users)
+            repo._rebuild_indexes()
+            start = time.perf_counter()
+            repo._save()
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            records = list(repo._read_records())
+            decode_time = time.perf_counter() - start
+            start = time.perf_counter()
+            UserRepository(path, codec=codec)
+            load_time = time.perf_counter() - start
+            size = os.path.getsize(path) / 2 ** 20
+            print(f"{name}: {size:.1f} МБ, запись {count / save_time:,.0f} записей/с, "
+                  f"чтение {len(records) / decode_time:,.0f} записей/с, загрузка репозитория {load_time:.2f} с")
+
+    # Память на экземпляр: User со __slots__ против такого же класса с __dict__
+    plain_user = dataclass(type('PlainUser', (), {'__annotations__': dict(User.__annotations__)}))
+    for name, cls in (('__dict__', plain_user), ('__slots__', User)):
+        tracemalloc.start()
+        instances = [cls(i, "name", "login", "password", None, None) for i in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del instances
+        print(f"User с {name}: {size / count:.0f} байт на экземпляр")
+
+
+# 12. Демонстрация работы
 if __name__ == "__main__":
     # Инициализация репозитория пользователей
     user_repo = UserRepository('users.json')
@@ -183,7 +1901,10 @@ if __name__ == "__main__":
 
     # Добавление пользователя
     user1 = User(id=1, name="Alice", login="alice", password="pass123", email="alice@example.com")
-    user_repo.add(user1)
+    if user_repo.get_by_id(user1.id) is None:
+        user_repo.add(user1)
+    else:
+        user_repo.update(user1)
 
     # Авторизация пользователя
     auth_service.sign_in(user1)
@@ -191,7 +1912,16 @@ if __name__ == "__main__":
 
     # Смена пользователя
     user2 = User(id=2, name="Bob", login="bob", password="bobpass", address="City")
-    user_repo.add(user2)
+    if user_repo.get_by_id(user2.id) is None:
+        user_repo.add(user2)
+    else:
+        user_repo.update(user2)
+
+    # Нарушение уникальности логина
+    try:
+        user_repo.add(User(id=3, name="Alice Clone", login="alice", password="x"))
+    except DuplicateKeyError as error:
+        print(f"Ошибка: {error}")
     auth_service.sign_in(user2)
     print(f"Новый пользователь: {auth_service.current_user.name}")
 
@@ -204,4 +1934,47 @@ if __name__ == "__main__":
 
     # Выход из системы
     new_auth_service.sign_out()
-    print(f"После выхода: авторизован — {new_auth_service.is_authorized}")
\ No newline at end of file
+    print(f"После выхода: авторизован — {new_auth_service.is_authorized}")
+
+    # Несколько одновременных сессий
+    session_service = SessionAuthService(user_repo, SessionStore(ttl=60))
+    alice_token = session_service.create_session(user1)
+    bob_token = session_service.create_session(user2)
+    print(f"Сессии: {session_service.resolve(alice_token).name}, {session_service.resolve(bob_token).name}")
+    session_service.end_session(alice_token)
+    print(f"После завершения сессии Alice: {session_service.resolve(alice_token)}")
+
+    # Запрос с вторичным индексом и план его выполнения
+    user_repo.create_index('name', IndexKind.SORTED)
+    query = user_repo.query().where('name', 'startswith', 'A').order_by('name').limit(5)
+    print(f"Запрос: {[user.login for user in query]}")
+    print(query.explain())
+
+    # Тот же сервис авторизации поверх SQLite-репозитория
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_repo = SqliteUserRepository(os.path.join(tmp, 'users.db'))
+        sqlite_repo.add(user1)
+        sqlite_auth = FileAuthService(sqlite_repo, os.path.join(tmp, 'auth.json'))
+        sqlite_auth.sign_in(sqlite_repo.get_by_login('alice'))
+        print(f"SQLite: авторизован {FileAuthService(sqlite_repo, os.path.join(tmp, 'auth.json')).current_user.name}")
+        sqlite_repo.close()
+
+    if '--bench' in sys.argv:
+        print("\nЗамер времени поиска:")
+        benchmark_lookups()
+        print("\nЗамер вставок:")
+        benchmark_inserts()
+        print("\nЗамер пакетного импорта:")
+        benchmark_bulk_import()
+        print("\nСравнение с SQLite:")
+        benchmark_sqlite()
+        print("\nПотоковая загрузка:")
+        benchmark_streaming_load()
+        print("\nЗапросы с индексами:")
+        benchmark_queries()
+        print("\nСессии:")
+        benchmark_sessions()
+        print("\nКонкурентная запись из нескольких процессов:")
+        benchmark_contention()
+        print("\nДвоичный формат против JSON:")
+        benchmark_binary_codec()
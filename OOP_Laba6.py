@@ -1,8 +1,24 @@
 import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import weakref
 from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from itertools import islice
+
+# Размер ссылки на объект в истории команд (64-битный CPython)
+REFERENCE_SIZE = 8
+
 
 # ======= PATTERN: Command =======
 class Command(ABC):
+    # Имя типа в реестре COMMAND_TYPES (задаётся декоратором register_command)
+    type_name = None
     @abstractmethod
     def execute(self):
         pass
@@ -15,7 +31,53 @@ class Command(ABC):
     def redo(self):
         return self.execute()
 
+    # Слияние с командой, выполненной следом: возвращает объединённую
+    # команду или None, если команды не объединяются
+    def merge(self, other):
+        return None
+
+    # Оценка памяти, которую команда занимает в истории. Команды из
+    # key_bindings общие, поэтому история хранит лишь ссылку на них
+    def size(self):
+        return REFERENCE_SIZE
+
+    # Параметры команды для сохранения (кроме receiver)
+    def to_dict(self):
+        return {}
+
+    @classmethod
+    def from_dict(cls, receiver, data):
+        return cls(receiver, **data)
+
+
+# ======= Реестр типов команд =======
+COMMAND_TYPES = {}
+
+
+def register_command(type_name):
+    def decorator(cls):
+        if type_name in COMMAND_TYPES:
+            raise ValueError(f"Command type already registered: {type_name}")
+        cls.type_name = type_name
+        COMMAND_TYPES[type_name] = cls
+        return cls
+    return decorator
+
+
+def serialize_command(cmd):
+    if cmd.type_name is None or COMMAND_TYPES.get(cmd.type_name) is not type(cmd):
+        raise TypeError(f"Command type is not registered: {type(cmd).__name__}")
+    return {'type': cmd.type_name, **cmd.to_dict()}
+
+
+def deserialize_command(receiver, data):
+    cls = COMMAND_TYPES.get(data['type'])
+    if cls is None:
+        raise ValueError(f"Unknown command type: {data['type']}")
+    return cls.from_dict(receiver, {name: value for name, value in data.items() if name != 'type'})
+
 
+@register_command('print')
 class PrintCharCommand(Command):
     def __init__(self, receiver, char):
         self.receiver = receiver
@@ -23,16 +85,59 @@ class PrintCharCommand(Command):
 
     def execute(self):
         self.receiver.print_char(self.char)
-        return self.receiver.text_buffer
+        return self.receiver.text.snapshot()
 
     def undo(self):
         self.receiver.remove_last_char()
-        return self.receiver.text_buffer
+        return self.receiver.text.snapshot()
 
     def redo(self):
         return self.execute()
 
+    def merge(self, other):
+        return TypeTextCommand(self.receiver, self.char).merge(other)
+
+    def to_dict(self):
+        return {'char': self.char}
+
+
+# Несколько подряд напечатанных символов (слово вместе с пробелами после него)
+@register_command('type_text')
+class TypeTextCommand(Command):
+    MAX_LENGTH = 64
+
+    def __init__(self, receiver, text):
+        self.receiver = receiver
+        self.text = text
+
+    def execute(self):
+        self.receiver.text.insert(self.text)
+        return self.receiver.text.snapshot()
+
+    def undo(self):
+        self.receiver.text.delete_before(len(self.text))
+        return self.receiver.text.snapshot()
+
+    def redo(self):
+        return self.execute()
+
+    def merge(self, other):
+        if not isinstance(other, PrintCharCommand) or len(self.text) >= self.MAX_LENGTH:
+            return None
+        # Новое слово начинается с непробельного символа после пробела
+        if self.text[-1].isspace() and not other.char.isspace():
+            return None
+        self.text += other.char
+        return self
+
+    def size(self):
+        return REFERENCE_SIZE + sys.getsizeof(self) + sys.getsizeof(self.text)
 
+    def to_dict(self):
+        return {'text': self.text}
+
+
+@register_command('volume_up')
 class VolumeUpCommand(Command):
     def __init__(self, receiver, step=10):
         self.receiver = receiver
@@ -49,7 +154,14 @@ class VolumeUpCommand(Command):
     def redo(self):
         return self.execute()
 
+    def merge(self, other):
+        return VolumeChangeCommand(self.receiver, self.step).merge(other)
+
+    def to_dict(self):
+        return {'step': self.step}
+
 
+@register_command('volume_down')
 class VolumeDownCommand(Command):
     def __init__(self, receiver, step=10):
         self.receiver = receiver
@@ -66,7 +178,48 @@ class VolumeDownCommand(Command):
     def redo(self):
         return self.execute()
 
+    def merge(self, other):
+        return VolumeChangeCommand(self.receiver, -self.step).merge(other)
+
+    def to_dict(self):
+        return {'step': self.step}
+
+
+# Серия изменений громкости, сведённая к одному итоговому изменению
+@register_command('volume_change')
+class VolumeChangeCommand(Command):
+    def __init__(self, receiver, delta):
+        self.receiver = receiver
+        self.delta = delta
+
+    def execute(self):
+        self.receiver.increase_volume(self.delta)
+        return f"volume changed {self.delta:+d}%"
 
+    def undo(self):
+        self.receiver.decrease_volume(self.delta)
+        return f"volume changed {-self.delta:+d}%"
+
+    def redo(self):
+        return self.execute()
+
+    def merge(self, other):
+        if isinstance(other, VolumeUpCommand):
+            self.delta += other.step
+        elif isinstance(other, VolumeDownCommand):
+            self.delta -= other.step
+        else:
+            return None
+        return self
+
+    def size(self):
+        return REFERENCE_SIZE + sys.getsizeof(self) + sys.getsizeof(self.delta)
+
+    def to_dict(self):
+        return {'delta': self.delta}
+
+
+@register_command('media_player')
 class MediaPlayerCommand(Command):
     def __init__(self, receiver):
         self.receiver = receiver
@@ -83,56 +236,691 @@ class MediaPlayerCommand(Command):
         return self.execute()
 
 
+# ======= Текстовый буфер с разрывом (gap buffer) =======
+# Текст хранится двумя списками символов: слева от курсора и справа от него
+# (в обратном порядке), разрыв между ними — позиция курсора. Вставка и
+# удаление у курсора — амортизированно O(1), перемещение курсора — O(расстояния).
+class GapBuffer:
+    def __init__(self, text=""):
+        self._left = list(text)
+        self._right = []
+        self._cache = text
+        self._snapshot = None
+        # Позиция первого изменения с последней контрольной точки (None - без изменений)
+        self.dirty_from = 0
+
+    def __len__(self):
+        return len(self._left) + len(self._right)
+
+    def __str__(self):
+        if self._cache is None:
+            self._cache = ''.join(self._left) + ''.join(reversed(self._right))
+        return self._cache
+
+    @property
+    def cursor(self):
+        return len(self._left)
+
+    # Правка: в позиции position вставляется inserted символов и/или
+    # удаляется текст removed
+    def _before_change(self, position, inserted=0, removed=''):
+        if self.dirty_from is None or position < self.dirty_from:
+            self.dirty_from = position
+        # Выданный снимок, который ещё кто-то держит, не копирует текст, а
+        # запоминает обратную правку относительно снимка следующего состояния
+        snapshot = self._snapshot() if self._snapshot is not None else None
+        if snapshot is not None:
+            newer = TextSnapshot(self)
+            snapshot.detach(newer, (position, inserted, removed))
+            self._snapshot = weakref.ref(newer)
+        else:
+            self._snapshot = None
+        self._cache = None
+
+    def snapshot(self):
+        # Живой снимок остаётся отслеживаемым, пока текст не менялся, поэтому
+        # его можно вернуть повторно; новый снимок не должен вытеснять его
+        # из self._snapshot, иначе _before_change уже не сможет его зафиксировать
+        snapshot = self._snapshot() if self._snapshot is not None else None
+        if snapshot is not None:
+            return snapshot
+        snapshot = TextSnapshot(self)
+        self._snapshot = weakref.ref(snapshot)
+        return snapshot
+
+    def move_cursor(self, position):
+        position = max(0, min(position, len(self)))
+        while len(self._left) > position:
+            self._right.append(self._left.pop())
+        while len(self._left) < position:
+            self._left.append(self._right.pop())
+
+    def insert(self, text):
+        self._before_change(len(self._left), inserted=len(text))
+        self._left.extend(text)
+
+    def delete_before(self, count=1):
+        count = min(count, len(self._left))
+        if count == 0:
+            return ''
+        removed = ''.join(self._left[len(self._left) - count:])
+        self._before_change(len(self._left) - count, removed=removed)
+        del self._left[len(self._left) - count:]
+        return removed
+
+    def delete_after(self, count=1):
+        count = min(count, len(self._right))
+        if count == 0:
+            return ''
+        removed = ''.join(reversed(self._right[len(self._right) - count:]))
+        self._before_change(len(self._left), removed=removed)
+        del self._right[len(self._right) - count:]
+        return removed
+
+    # Текст начиная с позиции position
+    def text_from(self, position):
+        if self._cache is not None:
+            return self._cache[position:]
+        if position >= len(self._left):
+            return ''.join(reversed(self._right))[position - len(self._left):]
+        return ''.join(self._left[position:]) + ''.join(reversed(self._right))
+
+    def mark_clean(self):
+        self.dirty_from = None
+
+
+# Результат команды печати: текст буфера на момент выполнения команды,
+# который собирается в строку только при первом обращении. Пока текст не
+# менялся, снимок ссылается на буфер; после правки - на снимок следующего
+# состояния (_newer) и обратную правку (_edit), поэтому правка стоит O(1),
+# а восстановление текста - O(длины текста) на каждую правку в цепочке.
+class TextSnapshot:
+    __slots__ = ('_buffer', '_newer', '_edit', '_text', '__weakref__')
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._newer = None
+        self._edit = None
+        self._text = None
+
+    def detach(self, newer, edit):
+        self._buffer = None
+        self._newer = newer
+        self._edit = edit
+
+    def freeze(self):
+        if self._text is None:
+            self._text = str(self)
+            self._buffer = self._newer = self._edit = None
+
+    def __str__(self):
+        return self.text_from_newer(None, None)
+
+    # Текст снимка; known - более новый снимок с уже собранным текстом known_text.
+    # Идём по цепочке до известного текста и откатываем правки в обратном порядке.
+    def text_from_newer(self, known, known_text):
+        chain = []
+        node = self
+        while node._text is None and node._buffer is None and node is not known:
+            chain.append(node._edit)
+            node = node._newer
+        if node is known:
+            text = known_text
+        else:
+            text = node._text if node._text is not None else str(node._buffer)
+        for position, inserted, removed in reversed(chain):
+            text = text[:position] + removed + text[position + inserted:]
+        return text
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __len__(self):
+        return len(str(self))
+
+
+# ======= История команд для undo/redo =======
+# Ограничивается числом команд (max_commands) и/или оценкой занимаемой памяти
+# (max_bytes); при переполнении вытесняются самые старые команды. При
+# coalesce=True подряд идущие команды сливаются (Command.merge) в одну.
+class CommandHistory:
+    def __init__(self, max_commands=None, max_bytes=None, coalesce=False):
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        self.coalesce = coalesce
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size_bytes = 0
+        self._sealed = True
+        # Для контрольных точек: число вытесненных команд и номера первых
+        # изменённых элементов стеков (в undo - с учётом вытесненных)
+        self.evicted = 0
+        self.undo_dirty_from = 0
+        self.redo_dirty_from = 0
+
+    def _touch_undo(self, index):
+        if index < self.undo_dirty_from:
+            self.undo_dirty_from = index
+
+    def _clear_redo(self):
+        if self.redo_stack:
+            self.redo_stack.clear()
+            self.redo_dirty_from = 0
+
+    def push(self, cmd):
+        self._clear_redo()
+        if self.coalesce and not self._sealed and self.undo_stack:
+            top = self.undo_stack[-1]
+            top_size = top.size()
+            merged = top.merge(cmd)
+            if merged is not None:
+                self.undo_stack[-1] = merged
+                self._touch_undo(self.evicted + len(self.undo_stack) - 1)
+                self.size_bytes += merged.size() - top_size
+                self._trim()
+                return
+        self._touch_undo(self.evicted + len(self.undo_stack))
+        self.undo_stack.append(cmd)
+        self.size_bytes += cmd.size()
+        self._sealed = False
+        self._trim()
+
+    def _trim(self):
+        while self.undo_stack and (
+                (self.max_commands is not None and len(self.undo_stack) > self.max_commands) or
+                (self.max_bytes is not None and self.size_bytes > self.max_bytes)):
+            self.size_bytes -= self.undo_stack.popleft().size()
+            self.evicted += 1
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        cmd = self.undo_stack.pop()
+        self._touch_undo(self.evicted + len(self.undo_stack))
+        self.size_bytes -= cmd.size()
+        self.redo_stack.append(cmd)
+        # После undo/redo новая команда не сливается с предыдущей
+        self._sealed = True
+        return cmd
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        cmd = self.redo_stack.pop()
+        self.redo_dirty_from = min(self.redo_dirty_from, len(self.redo_stack))
+        self._touch_undo(self.evicted + len(self.undo_stack))
+        self.undo_stack.append(cmd)
+        self.size_bytes += cmd.size()
+        self._sealed = True
+        self._trim()
+        return cmd
+
+    def extend(self, commands):
+        if self.coalesce:
+            for cmd in commands:
+                self.push(cmd)
+            return
+        if not commands:
+            return
+        self._clear_redo()
+        self._touch_undo(self.evicted + len(self.undo_stack))
+        self.undo_stack.extend(commands)
+        self.size_bytes += sum(cmd.size() for cmd in commands)
+        self._sealed = False
+        self._trim()
+
+    def clear(self):
+        self.evicted += len(self.undo_stack)
+        self.undo_stack.clear()
+        self._clear_redo()
+        self.size_bytes = 0
+        self._sealed = True
+
+    # Замена содержимого стеков (восстановление из контрольной точки)
+    def replace(self, undo, redo, evicted=0):
+        self.undo_stack = deque(undo)
+        self.redo_stack = list(redo)
+        self.evicted = evicted
+        self.size_bytes = sum(cmd.size() for cmd in self.undo_stack)
+        self._sealed = True
+        self.undo_dirty_from = evicted
+        self.redo_dirty_from = 0
+        self._trim()
+
+    def mark_clean(self):
+        self.undo_dirty_from = self.evicted + len(self.undo_stack)
+        self.redo_dirty_from = len(self.redo_stack)
+
+
+# ======= Запись макросов =======
+# Макрос хранит таблицу различных клавиш и последовательность их номеров.
+# Формат файла: заголовок, таблица клавиш (длина + UTF-8) и номера клавиш
+# по 1 байту (до 256 различных клавиш) или по 2 байта (little-endian).
+class Macro:
+    MAGIC = b'KMAC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBBHQ')
+    KEY_LENGTH = struct.Struct('<H')
+    UNDO = 'undo'
+    REDO = 'redo'
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self._codes = {}
+        self.events = array('H')
+        self.extend(keys)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        keys = self.keys
+        return (keys[code] for code in self.events)
+
+    def code(self, key):
+        return self._codes.get(key)
+
+    def _add_key(self, key):
+        if len(self.keys) > 0xFFFF:
+            raise ValueError("Macro supports at most 65536 distinct keys")
+        code = self._codes[key] = len(self.keys)
+        self.keys.append(key)
+        return code
+
+    def append(self, key):
+        code = self._codes.get(key)
+        if code is None:
+            code = self._add_key(key)
+        self.events.append(code)
+
+    def extend(self, keys):
+        for key in keys:
+            self.append(key)
+
+    def save(self, filename):
+        width = 1 if len(self.keys) <= 256 else 2
+        events = array('B', self.events) if width == 1 else array('H', self.events)
+        if width == 2 and sys.byteorder == 'big':
+            events.byteswap()
+        with open(filename, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, width, len(self.keys), len(events)))
+            for key in self.keys:
+                data = key.encode('utf-8')
+                f.write(self.KEY_LENGTH.pack(len(data)))
+                f.write(data)
+            events.tofile(f)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size:
+                raise ValueError(f"Not a macro file: {filename}")
+            magic, version, width, key_count, event_count = cls.HEADER.unpack(header)
+            if magic != cls.MAGIC or version != cls.VERSION or width not in (1, 2):
+                raise ValueError(f"Not a macro file: {filename}")
+            macro = cls()
+            for _ in range(key_count):
+                (length,) = cls.KEY_LENGTH.unpack(f.read(cls.KEY_LENGTH.size))
+                macro._add_key(f.read(length).decode('utf-8'))
+            data = f.read(event_count * width)
+            if len(data) != event_count * width:
+                raise ValueError(f"Truncated macro file: {filename}")
+            events = array('B' if width == 1 else 'H', data)
+        if width == 2 and sys.byteorder == 'big':
+            events.byteswap()
+        if events and max(events) >= key_count:
+            raise ValueError(f"Corrupted macro file: {filename}")
+        macro.events = events if width == 2 else array('H', events)
+        return macro
+
+
+# ======= Привязки последовательностей клавиш =======
+# Привязка - одно или несколько нажатий через пробел ('ctrl+k ctrl+c');
+# аккорд вроде 'ctrl+p' - одно нажатие, односимвольная строка (в том числе
+# ' ') - тоже одно нажатие.
+def parse_key_sequence(binding):
+    if len(binding) == 1:
+        return (binding,)
+    keys = tuple(binding.split(' '))
+    if '' in keys:
+        raise ValueError(f"Invalid key sequence: {binding!r}")
+    return keys
+
+
+class _TrieNode:
+    __slots__ = ('children', 'binding')
+
+    def __init__(self):
+        self.children = {}
+        self.binding = None
+
+
+class BindingTrie:
+    def __init__(self):
+        self.root = _TrieNode()
+        # Меняется при каждом изменении структуры (сбрасывает незавершённый ввод)
+        self.version = 0
+
+    def insert(self, binding):
+        node = self.root
+        for key in parse_key_sequence(binding):
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _TrieNode()
+            node = child
+        node.binding = binding
+        self.version += 1
+
+    def remove(self, binding):
+        keys = parse_key_sequence(binding)
+        path = [self.root]
+        for key in keys:
+            node = path[-1].children.get(key)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].binding = None
+        # Удаление опустевших узлов снизу вверх
+        for depth in range(len(keys), 0, -1):
+            node = path[depth]
+            if node.binding is not None or node.children:
+                break
+            del path[depth - 1].children[keys[depth - 1]]
+        self.version += 1
+
+    def clear(self):
+        self.root = _TrieNode()
+        self.version += 1
+
+
+# Словарь привязок, синхронно поддерживающий trie последовательностей
+class KeyBindings(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.trie = BindingTrie()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, binding, command):
+        if binding not in self:
+            self.trie.insert(binding)
+        super().__setitem__(binding, command)
+
+    def __delitem__(self, binding):
+        super().__delitem__(binding)
+        self.trie.remove(binding)
+
+    def pop(self, binding, *default):
+        if binding in self:
+            self.trie.remove(binding)
+        return super().pop(binding, *default)
+
+    def popitem(self):
+        binding, command = super().popitem()
+        self.trie.remove(binding)
+        return binding, command
+
+    def setdefault(self, binding, command=None):
+        if binding not in self:
+            self[binding] = command
+        return self[binding]
+
+    def clear(self):
+        super().clear()
+        self.trie.clear()
+
+    def update(self, *args, **kwargs):
+        bindings = dict(*args, **kwargs)
+        # Все последовательности проверяются до изменения словаря
+        for binding in bindings:
+            parse_key_sequence(binding)
+        for binding, command in bindings.items():
+            self[binding] = command
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
 # ======= Receiver (Keyboard) =======
 class Keyboard:
-    def __init__(self):
-        self.key_bindings = {}
-        self.undo_stack = []
-        self.redo_stack = []
-        self.text_buffer = ""
+    def __init__(self, history=None, output_limit=10_000, echo=True, sequence_timeout=1.0):
+        self.key_bindings = KeyBindings()
+        self.history = history if history is not None else CommandHistory()
+        self.text = GapBuffer()
         self.volume = 50
         self.is_media_player_running = False
-        self.output = []
+        # Кольцевой буфер последних output_limit результатов (тексты - TextSnapshot)
+        self._output = deque(maxlen=output_limit)
+        self.echo = echo
+        self.recorder = None
+        # Контрольная точка KeyboardStateSaver, относительно которой
+        # отслеживаются изменения текста и истории
+        self.checkpoint = None
+        # Незавершённая последовательность нажатий (узел trie)
+        self.sequence_timeout = sequence_timeout
+        self._pending = None
+        self._pending_keys = []
+        self._pending_since = 0.0
+        self._pending_version = 0
 
     def add_binding(self, key, command):
         self.key_bindings[key] = command
 
+    # Пакетная перепривязка: bindings - новые привязки, remove - удаляемые
+    def rebind(self, bindings=None, remove=()):
+        bindings = dict(bindings or {})
+        for binding in bindings:
+            parse_key_sequence(binding)
+        for binding in remove:
+            self.key_bindings.pop(binding, None)
+        self.key_bindings.update(bindings)
+        self._reset_pending()
+
+    # Потоковый ввод по одному нажатию. Привязка срабатывает, как только
+    # набрана целиком; если она же является префиксом более длинной
+    # привязки, срабатывает при обрыве последовательности или по истечении
+    # sequence_timeout секунд без нажатий.
+    def press(self, key, now=None):
+        if now is None:
+            now = time.monotonic()
+        trie = self.key_bindings.trie
+        if self._pending is not None:
+            if self._pending_version != trie.version:
+                self._reset_pending()
+            elif now - self._pending_since >= self.sequence_timeout:
+                self._resolve_pending()
+        node = self._pending if self._pending is not None else trie.root
+        child = node.children.get(key)
+        if child is None:
+            if self._pending is None:
+                self.execute_command(key)
+                return
+            # Последовательность оборвалась: набранный префикс срабатывает,
+            # а нажатие обрабатывается заново
+            self._resolve_pending()
+            self.press(key, now)
+            return
+        if not child.children:
+            self._reset_pending()
+            self.execute_command(child.binding)
+            return
+        self._pending = child
+        self._pending_keys.append(key)
+        self._pending_since = now
+        self._pending_version = trie.version
+
+    # Проверка таймаута незавершённой последовательности без нового нажатия
+    def poll(self, now=None):
+        if self._pending is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if self._pending_version != self.key_bindings.trie.version:
+            self._reset_pending()
+        elif now - self._pending_since >= self.sequence_timeout:
+            self._resolve_pending()
+
+    # Конец ввода: незавершённая последовательность обрабатывается сразу
+    def flush_pending(self):
+        if self._pending is not None:
+            self._resolve_pending()
+
+    def _resolve_pending(self):
+        node, keys = self._pending, self._pending_keys
+        self._reset_pending()
+        if node.binding is not None:
+            self.execute_command(node.binding)
+        else:
+            self._emit(f"Unknown key sequence: {' '.join(keys)}")
+
+    def _reset_pending(self):
+        self._pending = None
+        self._pending_keys = []
+
+    @property
+    def undo_stack(self):
+        return self.history.undo_stack
+
+    @property
+    def redo_stack(self):
+        return self.history.redo_stack
+
+    # Результаты в виде строк. Снимки собираются от новых к старым: каждому
+    # достаточно отменить свои правки в уже собранном следующем тексте.
+    # Список строк занимает O(число результатов * длина текста) памяти.
+    @property
+    def output(self):
+        texts = []
+        known = known_text = None
+        for result in reversed(self._output):
+            if isinstance(result, TextSnapshot):
+                known_text = result.text_from_newer(known, known_text)
+                known = result
+                texts.append(known_text)
+            else:
+                texts.append(str(result))
+        texts.reverse()
+        return texts
+
+    def _emit(self, result):
+        self._output.append(result)
+        if self.echo:
+            print(result)
+
     def execute_command(self, key):
+        if self.recorder is not None:
+            self.recorder.append(key)
         if key not in self.key_bindings:
-            msg = f"Unknown key: {key}"
-            self.output.append(msg)
-            print(msg)
+            self._emit(f"Unknown key: {key}")
             return
         cmd = self.key_bindings[key]
-        result = cmd.execute()
-        self.output.append(result)
-        print(result)
-        self.undo_stack.append(cmd)
-        self.redo_stack.clear()
+        self._emit(cmd.execute())
+        self.history.push(cmd)
 
     def undo(self):
-        if not self.undo_stack:
-            return
-        cmd = self.undo_stack.pop()
-        result = cmd.undo()
-        self.output.append(result)
-        print(result)
-        self.redo_stack.append(cmd)
+        if self.recorder is not None:
+            self.recorder.append(Macro.UNDO)
+        cmd = self.history.undo()
+        if cmd is not None:
+            self._emit(cmd.undo())
 
     def redo(self):
-        if not self.redo_stack:
-            return
-        cmd = self.redo_stack.pop()
-        result = cmd.redo()
-        self.output.append(result)
-        print(result)
-        self.undo_stack.append(cmd)
+        if self.recorder is not None:
+            self.recorder.append(Macro.REDO)
+        cmd = self.history.redo()
+        if cmd is not None:
+            self._emit(cmd.redo())
+
+    def start_recording(self, macro=None):
+        self.recorder = macro if macro is not None else Macro()
+        return self.recorder
+
+    def stop_recording(self):
+        macro, self.recorder = self.recorder, None
+        return macro
+
+    # Пакетное воспроизведение макроса. Привязки разрешаются один раз на каждую
+    # различную клавишу, подряд идущие символы вставляются в текст одной
+    # операцией. При echo=False результаты не сохраняются и не печатаются,
+    # при echo=True попадают в output (серия символов - одним снимком текста)
+    # и печатаются разом в конце.
+    def replay(self, macro, echo=False):
+        commands = []
+        chars = []
+        for key in macro.keys:
+            cmd = None if key in (Macro.UNDO, Macro.REDO) else self.key_bindings.get(key)
+            commands.append(cmd)
+            # Вставлять пачкой можно только символы, печатаемые в эту клавиатуру
+            batchable = isinstance(cmd, PrintCharCommand) and cmd.receiver is self
+            chars.append(cmd.char if batchable else None)
+        undo_code = macro.code(Macro.UNDO)
+        redo_code = macro.code(Macro.REDO)
+        history = self.history
+        results = []
+        emit = results.append if echo else (lambda result: None)
+        run = []
+
+        def flush():
+            self.text.insert(''.join([chars[code] for code in run]))
+            history.extend([commands[code] for code in run])
+            emit(self.text.snapshot())
+            run.clear()
+
+        start = time.perf_counter()
+        for code in macro.events:
+            if chars[code] is not None:
+                run.append(code)
+                continue
+            if run:
+                flush()
+            if code == undo_code:
+                cmd = history.undo()
+                if cmd is not None:
+                    emit(cmd.undo())
+            elif code == redo_code:
+                cmd = history.redo()
+                if cmd is not None:
+                    emit(cmd.redo())
+            elif commands[code] is None:
+                emit(f"Unknown key: {macro.keys[code]}")
+            else:
+                cmd = commands[code]
+                emit(cmd.execute())
+                history.push(cmd)
+        if run:
+            flush()
+        elapsed = time.perf_counter() - start
+
+        if echo:
+            self._output.extend(results)
+            if results:
+                print('\n'.join(map(str, results)))
+        return {
+            'keys': len(macro),
+            'seconds': elapsed,
+            'keys_per_second': len(macro) / elapsed if elapsed > 0 else float('inf'),
+        }
+
+    @property
+    def text_buffer(self):
+        return str(self.text)
+
+    @text_buffer.setter
+    def text_buffer(self, value):
+        self.text = GapBuffer(value)
 
     def print_char(self, char):
-        self.text_buffer += char
+        self.text.insert(char)
 
     def remove_last_char(self):
-        self.text_buffer = self.text_buffer[:-1]
+        self.text.delete_before(1)
 
     def increase_volume(self, step):
         self.volume += step
@@ -148,40 +936,441 @@ class Keyboard:
 
 
 # ======= PATTERN: Memento =======
+# Файл состояния - JSON-строки: полный снимок (привязки, текст, громкость,
+# стеки undo/redo), за которым следуют дельты последующих сохранений. Через
+# snapshot_every дельт или когда дельты перерастают снимок, файл
+# переписывается новым снимком, поэтому восстановление читает только
+# снимок и дельты после него. Команды в стеках, совпадающие с привязками,
+# записываются именем клавиши, остальные - через реестр типов команд.
+class _Checkpoint:
+    def __init__(self, path, keyboard):
+        self.path = path
+        self.history = keyboard.history
+        self.bindings = {}
+        # Состояние стеков на момент сохранения
+        self.undo_base = 0
+        self.undo_top = 0
+        self.redo_top = 0
+        self.size = 0
+        self.snapshot_size = 0
+        self.deltas = 0
+
+
 class KeyboardStateSaver:
+    VERSION = 1
+
+    def __init__(self, snapshot_every=100):
+        self.snapshot_every = snapshot_every
+
+    @staticmethod
+    def _encode_stack(commands, binding_keys):
+        return [binding_keys.get(id(cmd)) or serialize_command(cmd) for cmd in commands]
+
+    @staticmethod
+    def _decode_stack(entries, keyboard, bindings):
+        commands = []
+        for entry in entries:
+            if isinstance(entry, str):
+                if entry not in bindings:
+                    raise ValueError(f"Unknown key in saved history: {entry}")
+                commands.append(bindings[entry])
+            else:
+                commands.append(deserialize_command(keyboard, entry))
+        return commands
+
+    @staticmethod
+    def _receiver_state(keyboard):
+        return {
+            'volume': keyboard.volume,
+            'media_player': keyboard.is_media_player_running,
+            'cursor': keyboard.text.cursor,
+        }
+
     def save(self, filename, keyboard):
-        serialized = {}
-        for key, cmd in keyboard.key_bindings.items():
-            if isinstance(cmd, PrintCharCommand):
-                serialized[key] = {'type': 'print', 'char': cmd.char}
-            elif isinstance(cmd, VolumeUpCommand):
-                serialized[key] = {'type': 'volume_up', 'step': cmd.step}
-            elif isinstance(cmd, VolumeDownCommand):
-                serialized[key] = {'type': 'volume_down', 'step': cmd.step}
-            elif isinstance(cmd, MediaPlayerCommand):
-                serialized[key] = {'type': 'media_player'}
-        with open(filename, 'w') as f:
-            json.dump(serialized, f)
+        path = os.path.abspath(filename)
+        bindings = {key: serialize_command(cmd) for key, cmd in keyboard.key_bindings.items()}
+        checkpoint = keyboard.checkpoint
+        incremental = (
+                checkpoint is not None and checkpoint.path == path and
+                checkpoint.history is keyboard.history and
+                checkpoint.deltas < self.snapshot_every and
+                checkpoint.size - checkpoint.snapshot_size < checkpoint.snapshot_size and
+                os.path.exists(path) and os.path.getsize(path) == checkpoint.size)
+        if incremental:
+            self._append_delta(checkpoint, keyboard, bindings)
+        else:
+            self._write_snapshot(path, keyboard, bindings)
+        keyboard.checkpoint.bindings = bindings
+        self._mark_saved(keyboard)
+
+    @staticmethod
+    def _mark_saved(keyboard):
+        history = keyboard.history
+        keyboard.checkpoint.undo_base = history.evicted
+        keyboard.checkpoint.undo_top = history.evicted + len(history.undo_stack)
+        keyboard.checkpoint.redo_top = len(history.redo_stack)
+        keyboard.text.mark_clean()
+        history.mark_clean()
+
+    def _write_snapshot(self, path, keyboard, bindings):
+        history = keyboard.history
+        binding_keys = {id(cmd): key for key, cmd in keyboard.key_bindings.items()}
+        record = {
+            'kind': 'snapshot',
+            'version': self.VERSION,
+            'bindings': bindings,
+            'state': self._receiver_state(keyboard),
+            'text': str(keyboard.text),
+            'undo_base': history.evicted,
+            'undo': self._encode_stack(history.undo_stack, binding_keys),
+            'redo': self._encode_stack(history.redo_stack, binding_keys),
+        }
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        checkpoint = _Checkpoint(path, keyboard)
+        checkpoint.size = checkpoint.snapshot_size = len(data)
+        keyboard.checkpoint = checkpoint
+
+    def _append_delta(self, checkpoint, keyboard, bindings):
+        history = keyboard.history
+        record = {'kind': 'delta', 'state': self._receiver_state(keyboard)}
+        changed = {key: spec for key, spec in bindings.items() if checkpoint.bindings.get(key) != spec}
+        removed = [key for key in checkpoint.bindings if key not in bindings]
+        if changed or removed:
+            record['bindings'] = {'set': changed, 'remove': removed}
+        if keyboard.text.dirty_from is not None:
+            position = keyboard.text.dirty_from
+            record['text'] = {'at': position, 'insert': keyboard.text.text_from(position)}
+
+        binding_keys = None
+        top = history.evicted + len(history.undo_stack)
+        if (history.undo_dirty_from < checkpoint.undo_top or top != checkpoint.undo_top or
+                history.evicted != checkpoint.undo_base):
+            binding_keys = {id(cmd): key for key, cmd in keyboard.key_bindings.items()}
+            position = max(history.undo_dirty_from, history.evicted)
+            # Изменённая верхушка стека берётся с конца deque
+            pushed = list(islice(reversed(history.undo_stack), top - position))[::-1]
+            record['undo'] = {'base': history.evicted, 'at': position,
+                              'push': self._encode_stack(pushed, binding_keys)}
+        if history.redo_dirty_from < checkpoint.redo_top or len(history.redo_stack) != checkpoint.redo_top:
+            if binding_keys is None:
+                binding_keys = {id(cmd): key for key, cmd in keyboard.key_bindings.items()}
+            position = history.redo_dirty_from
+            record['redo'] = {'at': position,
+                              'push': self._encode_stack(history.redo_stack[position:], binding_keys)}
+
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(checkpoint.path, 'ab') as f:
+            f.write(data)
+        checkpoint.size += len(data)
+        checkpoint.deltas += 1
 
     def load(self, filename, keyboard):
         try:
-            with open(filename, 'r') as f:
-                serialized = json.load(f)
-            keyboard.key_bindings.clear()
-            for key, data in serialized.items():
-                if data['type'] == 'print':
-                    cmd = PrintCharCommand(keyboard, data['char'])
-                elif data['type'] == 'volume_up':
-                    cmd = VolumeUpCommand(keyboard, data['step'])
-                elif data['type'] == 'volume_down':
-                    cmd = VolumeDownCommand(keyboard, data['step'])
-                elif data['type'] == 'media_player':
-                    cmd = MediaPlayerCommand(keyboard)
-                else:
-                    continue
-                keyboard.add_binding(key, cmd)
+            with open(filename, 'rb') as f:
+                lines = f.read().decode('utf-8').splitlines()
         except FileNotFoundError:
             print("State file not found. Starting fresh.")
+            return
+        try:
+            snapshot = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            snapshot = {}
+        if snapshot.get('kind') != 'snapshot':
+            self._load_bindings(json.loads('\n'.join(lines)) if lines else {}, keyboard)
+            return
+
+        bindings = {}
+        self._apply_bindings(bindings, snapshot['bindings'], [], keyboard)
+        state = snapshot['state']
+        text = GapBuffer(snapshot['text'])
+        base = snapshot['undo_base']
+        undo = deque(self._decode_stack(snapshot['undo'], keyboard, bindings))
+        redo = self._decode_stack(snapshot['redo'], keyboard, bindings)
+        deltas = 0
+        truncated = False
+        for number, line in enumerate(lines[1:], start=2):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Недописанная последняя дельта (сбой во время сохранения)
+                if number == len(lines):
+                    truncated = True
+                    break
+                raise
+            if 'bindings' in record:
+                self._apply_bindings(bindings, record['bindings']['set'], record['bindings']['remove'], keyboard)
+            state = record['state']
+            if 'text' in record:
+                # Курсор остаётся в конце текста, поэтому правка стоит O(длины дельты)
+                change = record['text']
+                text.delete_before(len(text) - change['at'])
+                text.insert(change['insert'])
+            if 'undo' in record:
+                change = record['undo']
+                for _ in range(min(change['base'] - base, len(undo))):
+                    undo.popleft()
+                base = change['base']
+                while len(undo) > change['at'] - base:
+                    undo.pop()
+                undo.extend(self._decode_stack(change['push'], keyboard, bindings))
+            if 'redo' in record:
+                change = record['redo']
+                del redo[change['at']:]
+                redo.extend(self._decode_stack(change['push'], keyboard, bindings))
+            deltas += 1
+
+        keyboard.key_bindings.clear()
+        for key, cmd in bindings.items():
+            keyboard.add_binding(key, cmd)
+        text.move_cursor(state['cursor'])
+        keyboard.text = text
+        keyboard.volume = state['volume']
+        keyboard.is_media_player_running = state['media_player']
+        keyboard.history.replace(undo, redo, base)
+
+        # Продолжение сохранений в тот же файл дописывает дельты
+        checkpoint = _Checkpoint(os.path.abspath(filename), keyboard)
+        checkpoint.bindings = {key: serialize_command(cmd) for key, cmd in bindings.items()}
+        checkpoint.snapshot_size = len(lines[0].encode('utf-8')) + 1
+        # После недописанной дельты следующее сохранение перепишет файл снимком
+        checkpoint.size = -1 if truncated else os.path.getsize(filename)
+        checkpoint.deltas = deltas
+        keyboard.checkpoint = checkpoint
+        self._mark_saved(keyboard)
+
+    @staticmethod
+    def _apply_bindings(bindings, changed, removed, keyboard):
+        for key in removed:
+            bindings.pop(key, None)
+        for key, data in changed.items():
+            bindings[key] = deserialize_command(keyboard, data)
+
+    # Прежний формат: один JSON-объект только с привязками клавиш
+    @staticmethod
+    def _load_bindings(serialized, keyboard):
+        keyboard.key_bindings.clear()
+        for key, data in serialized.items():
+            if data.get('type') in COMMAND_TYPES:
+                keyboard.add_binding(key, deserialize_command(keyboard, data))
+
+
+# ======= Замер производительности =======
+def benchmark_text_buffer(keystrokes=1_000_000, undo_every=10, legacy_keystrokes=20_000):
+    # Поток нажатий через Keyboard с настройками по умолчанию (кроме печати):
+    # каждое undo_every-е нажатие отменяется, результаты копятся в output
+    def replay(keyboard, command, count):
+        keyboard.add_binding('a', command)
+        start = time.perf_counter()
+        for i in range(count):
+            keyboard.execute_command('a')
+            if i % undo_every == 0:
+                keyboard.undo()
+        return time.perf_counter() - start
+
+    class StringKeyboard(Keyboard):
+        # Прежняя реализация: текст - неизменяемая строка, результат - её копия
+        plain_text = ""
+
+    class StringPrintCommand(PrintCharCommand):
+        def execute(self):
+            self.receiver.plain_text += self.char
+            return self.receiver.plain_text
+
+        def undo(self):
+            self.receiver.plain_text = self.receiver.plain_text[:-1]
+            return self.receiver.plain_text
+
+    legacy_keyboard = StringKeyboard(echo=False)
+    legacy = replay(legacy_keyboard, StringPrintCommand(legacy_keyboard, 'a'), legacy_keystrokes)
+    keyboard = Keyboard(echo=False)
+    gap = replay(keyboard, PrintCharCommand(keyboard, 'a'), keystrokes)
+    print(f"Строка: {legacy_keystrokes} нажатий за {legacy:.2f} с "
+          f"({legacy_keystrokes / legacy:,.0f} нажатий/с)")
+    print(f"Gap buffer: {keystrokes} нажатий за {gap:.2f} с ({keystrokes / gap:,.0f} нажатий/с)")
+
+
+def benchmark_history(keystrokes=10_000_000, checkpoints=5):
+    # Поток: слова из 5 букв через пробел, изредка изменение громкости и undo
+    def measure(history):
+        keyboard = Keyboard(history, output_limit=0, echo=False)
+        for key in 'abcd':
+            keyboard.add_binding(key, PrintCharCommand(keyboard, key))
+        keyboard.add_binding(' ', PrintCharCommand(keyboard, ' '))
+        keyboard.add_binding('ctrl++', VolumeUpCommand(keyboard, 5))
+        keyboard.add_binding('ctrl+-', VolumeDownCommand(keyboard, 5))
+        pattern = ['a', 'b', 'c', 'd', 'a', ' ', 'ctrl++', 'ctrl++', 'ctrl+-', 'b', 'a', 'd', ' ']
+        step = keystrokes // checkpoints
+        start = time.perf_counter()
+        for i in range(keystrokes):
+            if i % 1000 == 999:
+                keyboard.undo()
+            else:
+                keyboard.execute_command(pattern[i % len(pattern)])
+            if (i + 1) % step == 0:
+                print(f"  {i + 1:>10} нажатий: команд в истории {len(history.undo_stack):>9}, "
+                      f"~{history.size_bytes / 2 ** 20:8.1f} МБ")
+        print(f"  {keystrokes / (time.perf_counter() - start):,.0f} нажатий/с")
+
+    print("Без ограничений и слияния:")
+    measure(CommandHistory())
+    print("Слияние команд, не более 10000 команд и 1 МБ:")
+    measure(CommandHistory(max_commands=10_000, max_bytes=2 ** 20, coalesce=True))
+
+
+def benchmark_replay(keys=1_000_000, seed=42):
+    def make_keyboard():
+        keyboard = Keyboard(output_limit=0, echo=False)
+        for char in 'abcdefghijklmnopqrstuvwxyz ':
+            keyboard.add_binding(char, PrintCharCommand(keyboard, char))
+        keyboard.add_binding('ctrl++', VolumeUpCommand(keyboard, 5))
+        keyboard.add_binding('ctrl+-', VolumeDownCommand(keyboard, 5))
+        keyboard.add_binding('ctrl+p', MediaPlayerCommand(keyboard))
+        return keyboard
+
+    # Записанная сессия: слова, изредка громкость, плеер и undo/redo
+    rng = random.Random(seed)
+    special = ['ctrl++', 'ctrl+-', 'ctrl+p', 'undo', 'undo', 'redo']
+    recorder = make_keyboard()
+    macro = recorder.start_recording()
+    while len(macro) < keys:
+        if rng.random() < 0.05:
+            key = rng.choice(special)
+            if key == 'undo':
+                recorder.undo()
+            elif key == 'redo':
+                recorder.redo()
+            else:
+                recorder.execute_command(key)
+        else:
+            for char in rng.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet']) + ' ':
+                recorder.execute_command(char)
+    recorder.stop_recording()
+
+    fd, path = tempfile.mkstemp(suffix='.kmac')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        macro.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        macro = Macro.load(path)
+        loaded = time.perf_counter() - start
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    json_size = len(json.dumps(list(macro)))
+    print(f"Макрос: {len(macro)} нажатий, файл {size / 1024:.0f} КБ (JSON: {json_size / 1024:.0f} КБ), "
+          f"запись {saved:.3f} с, чтение {loaded:.3f} с")
+
+    keyboard = make_keyboard()
+    start = time.perf_counter()
+    for key in macro:
+        if key == Macro.UNDO:
+            keyboard.undo()
+        elif key == Macro.REDO:
+            keyboard.redo()
+        else:
+            keyboard.execute_command(key)
+    elapsed = time.perf_counter() - start
+    print(f"По одной клавише: {len(macro) / elapsed:,.0f} нажатий/с")
+
+    replayed = make_keyboard()
+    report = replayed.replay(macro)
+    print(f"Пакетное воспроизведение: {report['keys_per_second']:,.0f} нажатий/с")
+    assert replayed.text_buffer == keyboard.text_buffer == recorder.text_buffer
+    assert replayed.volume == keyboard.volume and len(replayed.undo_stack) == len(keyboard.undo_stack)
+
+
+def benchmark_checkpoints(keys=200_000, save_every=1_000, seed=7):
+    # Сессия набора текста с сохранением каждые save_every нажатий: полная
+    # перезапись файла против снимка с дельтами
+    def run(snapshot_every, path):
+        rng = random.Random(seed)
+        keyboard = Keyboard(output_limit=0, echo=False)
+        for char in 'abcdefgh ':
+            keyboard.add_binding(char, PrintCharCommand(keyboard, char))
+        keyboard.add_binding('ctrl++', VolumeUpCommand(keyboard, 5))
+        saver = KeyboardStateSaver(snapshot_every)
+        keys_pressed = 0
+        saving = 0.0
+        while keys_pressed < keys:
+            for _ in range(save_every):
+                r = rng.random()
+                if r < 0.02:
+                    keyboard.undo()
+                elif r < 0.03:
+                    keyboard.execute_command('ctrl++')
+                else:
+                    keyboard.execute_command(rng.choice('abcdefgh '))
+            keys_pressed += save_every
+            start = time.perf_counter()
+            saver.save(path, keyboard)
+            saving += time.perf_counter() - start
+        start = time.perf_counter()
+        restored = Keyboard(output_limit=0, echo=False)
+        KeyboardStateSaver().load(path, restored)
+        loading = time.perf_counter() - start
+        assert restored.text_buffer == keyboard.text_buffer and len(restored.undo_stack) == len(keyboard.undo_stack)
+        return saving, loading, os.path.getsize(path)
+
+    saves = keys // save_every
+    with tempfile.TemporaryDirectory() as directory:
+        for title, snapshot_every in (("Полный снимок при каждом сохранении", 0),
+                                      ("Снимок + дельты", 100)):
+            saving, loading, size = run(snapshot_every, os.path.join(directory, f'state{snapshot_every}.jsonl'))
+            print(f"{title}: {saves} сохранений за {saving:.2f} с ({saving / saves * 1000:.2f} мс), "
+                  f"файл {size / 1024:.0f} КБ, восстановление {loading * 1000:.0f} мс")
+
+
+def benchmark_dispatch(bindings=10_000, events=200_000, naive_events=2_000, seed=3):
+    rng = random.Random(seed)
+    names = [f'f{i}' for i in range(30)] + ['ctrl+' + char for char in 'abcdefghijklmnopqrst']
+    sequences = set()
+    while len(sequences) < bindings:
+        sequences.add(' '.join(rng.choice(names) for _ in range(rng.randint(1, 4))))
+    sequences = sorted(sequences)
+
+    keyboard = Keyboard(CommandHistory(max_commands=1000), output_limit=0, echo=False)
+    command = VolumeUpCommand(keyboard, 1)
+    start = time.perf_counter()
+    keyboard.rebind({sequence: command for sequence in sequences})
+    bind_time = time.perf_counter() - start
+
+    stream = []
+    while len(stream) < events:
+        stream.extend(rng.choice(sequences).split(' '))
+    stream = stream[:events]
+
+    timings = []
+    clock = time.perf_counter_ns
+    for key in stream:
+        start = clock()
+        keyboard.press(key, 0.0)
+        timings.append(clock() - start)
+    keyboard.flush_pending()
+    timings.sort()
+    mean = sum(timings) / len(timings) / 1000
+    p99 = timings[int(len(timings) * 0.99)] / 1000
+
+    # Без trie: поиск более длинных привязок с тем же префиксом перебором словаря
+    flat = dict.fromkeys(sequences, command)
+    typed = []
+    start = time.perf_counter()
+    for key in stream[:naive_events]:
+        typed.append(key)
+        candidate = ' '.join(typed)
+        prefix = candidate + ' '
+        if not any(binding.startswith(prefix) for binding in flat):
+            typed = []
+    naive = (time.perf_counter() - start) / naive_events * 1e6
+
+    print(f"Привязок: {bindings}, пакетная привязка {bind_time * 1000:.0f} мс")
+    print(f"Trie: {events} нажатий, среднее {mean:.2f} мкс, p99 {p99:.2f} мкс на нажатие")
+    print(f"Перебор словаря: среднее {naive:.1f} мкс на нажатие")
 
 
 # ======= Демонстрация =======
@@ -226,3 +1415,14 @@ def main():
 
 if __name__ == "__main__":
     main()
+    if '--bench' in sys.argv:
+        print("\nТекстовый буфер:")
+        benchmark_text_buffer()
+        print("\nИстория команд:")
+        benchmark_history()
+        print("\nВоспроизведение макросов:")
+        benchmark_replay()
+        print("\nКонтрольные точки состояния:")
+        benchmark_checkpoints()
+        print("\nДиспетчеризация последовательностей клавиш:")
+        benchmark_dispatch()
@@ -0,0 +1,376 @@
+import asyncio
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import di_container
+from di_container import DependencyInjector, LifeStyle
+
+
+class LegacyInjector(DependencyInjector):
+    # Resolution as it was before compiled plans: the registration is
+    # interpreted recursively on every call
+    def get_instance(self, interface):
+        if interface not in self._registrations:
+            raise ValueError(f"Interface {interface} not registered")
+
+        reg = self._registrations[interface]
+        lifestyle = reg["lifestyle"]
+
+        if lifestyle == LifeStyle.SINGLETON:
+            if interface not in self._singletons:
+                self._singletons[interface] = self._create_instance(interface)
+            return self._singletons[interface]
+
+        elif lifestyle == LifeStyle.SCOPED:
+            if interface not in self._scoped_instances:
+                self._scoped_instances[interface] = self._create_instance(interface)
+            return self._scoped_instances[interface]
+
+        return self._create_instance(interface)
+
+    def _create_instance(self, interface):
+        reg = self._registrations[interface]
+        if reg["factory"]:
+            return reg["factory"]()
+
+        constructor_args = {}
+        for param_name, param_value in reg["params"].items():
+            if isinstance(param_value, type):
+                constructor_args[param_name] = self.get_instance(param_value)
+            else:
+                constructor_args[param_name] = param_value
+        return reg["impl"](**constructor_args)
+
+    @contextmanager
+    def create_scope(self):
+        old_scope = self._scoped_instances.copy()
+        self._scoped_instances = {}
+        try:
+            yield self
+        finally:
+            self._scoped_instances = old_scope
+
+
+class Node:
+    def __init__(self, **dependencies):
+        self.dependencies = dependencies
+
+
+def build_graph(container, depth, width):
+    # Layers of `width` services; every service depends on two services of the
+    # next layer, the last layer holds singletons, every third layer is scoped
+    layers = [[type(f"I{level}_{index}", (), {}) for index in range(width)] for level in range(depth)]
+    for level in reversed(range(depth)):
+        for index, interface in enumerate(layers[level]):
+            implementation = type(f"Node{level}_{index}", (Node,), {})
+            if level == depth - 1:
+                container.register(interface, implementation, LifeStyle.SINGLETON, {"level": level})
+                continue
+            below = layers[level + 1]
+            params = {"left": below[index], "right": below[(index + 1) % width], "level": level}
+            lifestyle = LifeStyle.SCOPED if level % 3 == 2 else LifeStyle.PER_REQUEST
+            container.register(interface, implementation, lifestyle, params)
+    return layers[0][0]
+
+
+def benchmark_resolution(depth=12, width=4, seconds=1.0):
+    for title, container_class in (("Interpreted registrations", LegacyInjector),
+                                   ("Compiled plans", DependencyInjector)):
+        container = container_class()
+        root = build_graph(container, depth, width)
+        resolved = 0
+        start = time.perf_counter()
+        with container.create_scope():
+            container.get_instance(root)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            with container.create_scope():
+                for _ in range(10):
+                    container.get_instance(root)
+            resolved += 10
+        elapsed = time.perf_counter() - start
+        print(f"{title}: first resolve {first * 1000:.2f} ms, "
+              f"{resolved / elapsed:,.0f} resolutions/s (depth {depth}, width {width})")
+
+
+class SlowSingleton:
+    created = 0
+    created_lock = threading.Lock()
+
+    def __init__(self):
+        # A slow constructor widens the window for a racing second construction
+        time.sleep(0.01)
+        with SlowSingleton.created_lock:
+            SlowSingleton.created += 1
+
+
+class RequestContext:
+    pass
+
+
+class Handler:
+    def __init__(self, context, singleton):
+        self.context = context
+        self.singleton = singleton
+
+
+def _stress_container(container_class):
+    container = container_class()
+    container.register(SlowSingleton, SlowSingleton, LifeStyle.SINGLETON)
+    container.register(RequestContext, RequestContext, LifeStyle.SCOPED)
+    container.register(Handler, Handler, LifeStyle.PER_REQUEST,
+                       {"context": RequestContext, "singleton": SlowSingleton})
+    return container
+
+
+def _check_request(container, seen):
+    # Every resolution inside one scope must see the same RequestContext
+    handler = container.get_instance(Handler)
+    violations = 0
+    for _ in range(3):
+        time.sleep(0)
+        if container.get_instance(RequestContext) is not handler.context:
+            violations += 1
+    seen.append(handler.context)
+    return violations
+
+
+def stress_scopes(requests=5000, threads=32):
+    for title, container_class in (("Container-wide scope swap", LegacyInjector),
+                                   ("Context-local scopes", DependencyInjector)):
+        SlowSingleton.created = 0
+        container = _stress_container(container_class)
+        seen = []
+
+        def thread_request(_):
+            with container.create_scope():
+                return _check_request(container, seen)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            violations = sum(pool.map(thread_request, range(requests)))
+        thread_time = time.perf_counter() - start
+        thread_contexts = len({id(context) for context in seen})
+
+        async def task_request():
+            with container.create_scope():
+                handler = container.get_instance(Handler)
+                await asyncio.sleep(0)
+                broken = container.get_instance(RequestContext) is not handler.context
+                seen.append(handler.context)
+                return int(broken)
+
+        async def run_tasks():
+            return sum(await asyncio.gather(*(task_request() for _ in range(requests))))
+
+        seen = []
+        start = time.perf_counter()
+        task_violations = asyncio.run(run_tasks())
+        task_time = time.perf_counter() - start
+        task_contexts = len({id(context) for context in seen})
+
+        print(f"{title}:")
+        print(f"  threads: {requests / thread_time:,.0f} scopes/s, isolation violations {violations}, "
+              f"distinct contexts {thread_contexts}/{requests}")
+        print(f"  asyncio: {requests / task_time:,.0f} scopes/s, isolation violations {task_violations}, "
+              f"distinct contexts {task_contexts}/{requests}")
+        print(f"  singleton constructed {SlowSingleton.created} time(s)")
+        if container_class is DependencyInjector:
+            assert violations == 0 and task_violations == 0
+            assert thread_contexts == task_contexts == requests
+            assert SlowSingleton.created == 1
+
+
+def build_annotated_types(count, fan_out=3):
+    # Service i takes annotated dependencies on up to fan_out previous services
+    interfaces = [type(f"IAuto{index}", (), {}) for index in range(count)]
+    implementations = []
+    explicit_params = []
+    for index in range(count):
+        dependencies = interfaces[max(0, index - fan_out):index]
+        explicit_params.append({f"dep{number}": interface for number, interface in enumerate(dependencies)})
+        namespace = {f"T{number}": interface for number, interface in enumerate(dependencies)}
+        arguments = ", ".join(f"dep{number}: T{number}" for number in range(len(dependencies)))
+        exec(f"def __init__(self{', ' if arguments else ''}{arguments}):\n"
+             f"    self.dependencies = ({''.join(f'dep{number}, ' for number in range(len(dependencies)))})",
+             namespace)
+        implementations.append(type(f"Auto{index}", (), {"__init__": namespace["__init__"]}))
+    return interfaces, implementations, explicit_params
+
+
+def benchmark_autowiring(count=300, resolves=100_000):
+    for title, autowire in (("Explicit params", False), ("Autowired", True)):
+        interfaces, implementations, explicit_params = build_annotated_types(count)
+        misses_before = len(di_container._constructor_hints_cache)
+        start = time.perf_counter()
+        container = DependencyInjector()
+        for interface, implementation, params in zip(interfaces, implementations, explicit_params):
+            container.register(interface, implementation, LifeStyle.SINGLETON,
+                               None if autowire else params, autowire=autowire)
+        for interface in interfaces:
+            container.get_instance(interface)
+        startup = time.perf_counter() - start
+        introspected = len(di_container._constructor_hints_cache) - misses_before
+
+        # Only the top service is per request; its dependencies are singletons
+        container.register(interfaces[-1], implementations[-1], LifeStyle.PER_REQUEST,
+                           None if autowire else explicit_params[-1], autowire=autowire)
+        container.get_instance(interfaces[-1])
+        start = time.perf_counter()
+        for _ in range(resolves):
+            container.get_instance(interfaces[-1])
+        resolve_rate = resolves / (time.perf_counter() - start)
+        print(f"{title}: startup {startup * 1000:.1f} ms for {count} types "
+              f"({introspected} introspections), {resolve_rate:,.0f} resolutions/s")
+
+    # What the same introspection would cost if it were repeated on every resolve
+    _, implementations, _ = build_annotated_types(count)
+    start = time.perf_counter()
+    for implementation in implementations:
+        inspect.signature(implementation)
+        typing.get_type_hints(implementation.__init__)
+    per_type = (time.perf_counter() - start) / count
+    print(f"Uncached introspection: {per_type * 1e6:.1f} us per type "
+          f"(would cap resolution at ~{1 / per_type:,.0f}/s)")
+
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path[:0] = [{package_root!r}, {container_root!r}]
+import importlib
+from di_container import DependencyInjector, LifeStyle
+
+services, used, mode = {services}, {used}, {mode!r}
+interfaces = [type(f"IService{{index}}", (), {{}}) for index in range(services)]
+IRoot = type("IRoot", (), {{}})
+container = DependencyInjector()
+for index, interface in enumerate(interfaces):
+    if mode == "eager":
+        module = importlib.import_module(f"coldpkg.service{{index}}")
+        container.register(interface, getattr(module, f"Service{{index}}"), LifeStyle.SINGLETON)
+    else:
+        container.register(interface, f"coldpkg.service{{index}}:Service{{index}}", LifeStyle.SINGLETON, lazy=True)
+params = {{f"service{{index}}": interface for index, interface in enumerate(interfaces)}}
+if mode == "eager":
+    from coldpkg.root import Root
+    container.register(IRoot, Root, params=params)
+else:
+    container.register(IRoot, "coldpkg.root:Root", params=params)
+result = container.get_instance(IRoot).handle(used)
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "modules": sum(name.startswith("coldpkg.") for name in sys.modules),
+    "result": result,
+}}))
+"""
+
+
+def _write_cold_start_package(directory, services, methods=40, table_size=5000):
+    package = os.path.join(directory, "coldpkg")
+    os.mkdir(package)
+    open(os.path.join(package, "__init__.py"), "w").close()
+    for index in range(services):
+        lines = [f"class Service{index}:",
+                 "    def __init__(self):",
+                 f"        self.table = {{number: str(number) for number in range({table_size})}}",
+                 "",
+                 "    def value(self):",
+                 f"        return {index}"]
+        for number in range(methods):
+            lines += ["", f"    def method{number}(self, value):",
+                      f"        return [value * {number} + item for item in range(10)]"]
+        with open(os.path.join(package, f"service{index}.py"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+    with open(os.path.join(package, "root.py"), "w") as f:
+        f.write("class Root:\n"
+                "    def __init__(self, **services):\n"
+                "        self.services = services\n\n"
+                "    def handle(self, used):\n"
+                "        return sum(self.services[f'service{index}'].value() for index in range(used))\n")
+
+
+def benchmark_cold_start(services=300, used=5, runs=3):
+    # Every run is a fresh interpreter with empty import state (bytecode caches disabled)
+    container_root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        _write_cold_start_package(directory, services)
+        for mode in ("eager", "lazy"):
+            script = COLD_START_SCRIPT.format(package_root=directory, container_root=container_root,
+                                              services=services, used=used, mode=mode)
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, "-B", "-c", script], check=True,
+                                        capture_output=True, text=True).stdout
+                wall = time.perf_counter() - start
+                report = json.loads(output)
+                timings.append((report["seconds"], wall))
+            seconds, wall = min(timings)
+            print(f"{mode}: configure + first request {seconds * 1000:.0f} ms "
+                  f"(process {wall * 1000:.0f} ms), {report['modules']} of {services + 1} modules imported, "
+                  f"{used} of {services} services used")
+
+
+def _resolution_rate(container, root, seconds):
+    resolved = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        with container.create_scope():
+            for _ in range(10):
+                container.get_instance(root)
+        resolved += 10
+    return resolved / (time.perf_counter() - start)
+
+
+def benchmark_profiling(depth=12, width=4, seconds=1.0, top=3):
+    container = DependencyInjector()
+    root = build_graph(container, depth, width)
+    never_enabled = _resolution_rate(container, root, seconds)
+    profiler = container.enable_profiling()
+    enabled = _resolution_rate(container, root, seconds)
+    container.disable_profiling()
+    disabled = _resolution_rate(container, root, seconds)
+    print(f"Profiling never enabled: {never_enabled:,.0f} resolutions/s")
+    print(f"Profiling enabled: {enabled:,.0f} resolutions/s")
+    print(f"Profiling disabled again: {disabled:,.0f} resolutions/s")
+
+    report = profiler.report()
+    for service in report["services"][:top]:
+        print(f"  {service['interface']} ({service['lifestyle']}): {service['constructions']} constructions, "
+              f"total {service['total_ms']:.1f} ms, p99 {service['p99_ms'] * 1000:.1f} us")
+    print(f"  scopes: {report['scopes']['count']}, p99 lifetime {report['scopes']['p99_ms']:.2f} ms")
+    folded = profiler.to_folded().splitlines()
+    print(f"  {len(folded)} folded stacks, e.g. {folded[-1]}")
+
+    with container.create_scope():
+        _, tree = container.trace(root)
+    print(f"  resolution tree of one call: {tree['interface']} with {len(tree['children'])} dependencies, "
+          f"{tree['ms']:.3f} ms")
+
+
+def run_benchmarks():
+    print("\n=== RESOLUTION BENCHMARK ===")
+    benchmark_resolution()
+    print("\n=== CONCURRENT SCOPES STRESS TEST ===")
+    stress_scopes()
+    print("\n=== AUTOWIRING BENCHMARK ===")
+    benchmark_autowiring()
+    print("\n=== COLD START BENCHMARK ===")
+    benchmark_cold_start()
+    print("\n=== PROFILING OVERHEAD ===")
+    benchmark_profiling()
+
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -1,6 +1,17 @@
+import importlib
+import inspect
+import json
+import math
+import random
+import threading
+import time
+import typing
+import weakref
+from array import array
 from enum import Enum
 from types import FunctionType
 from contextlib import contextmanager
+from contextvars import ContextVar
 
 
 class LifeStyle(Enum):
@@ -9,69 +20,510 @@ class LifeStyle(Enum):
     SINGLETON = 3
 
 
+class CircularDependencyError(ValueError):
+    def __init__(self, path):
+        self.path = tuple(path)
+        super().__init__("Circular dependency: " + " -> ".join(_name(item) for item in self.path))
+
+
+def _name(interface):
+    return getattr(interface, "__name__", repr(interface))
+
+
+def _import_object(path):
+    # "package.module:Name" or "package.module.Name"
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        module_name, _, attribute = path.rpartition(".")
+    if not module_name or not attribute:
+        raise ValueError(f"Invalid import path: {path}")
+    target = importlib.import_module(module_name)
+    try:
+        for part in attribute.split("."):
+            target = getattr(target, part)
+    except AttributeError:
+        raise ImportError(f"Cannot import {attribute} from {module_name}") from None
+    return target
+
+
+class LazyProxy:
+    # Stands in for a service until its first attribute access, then forwards to the real instance
+    __slots__ = ("_lazy_factory", "_lazy_instance", "_lazy_lock")
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_target(self):
+        instance = self._lazy_instance
+        if instance is None:
+            with self._lazy_lock:
+                instance = self._lazy_instance
+                if instance is None:
+                    instance = self._lazy_factory()
+                    object.__setattr__(self, "_lazy_instance", instance)
+                    object.__setattr__(self, "_lazy_factory", None)
+        return instance
+
+    @property
+    def __class__(self):
+        return type(self._lazy_target())
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_target(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._lazy_target(), name)
+
+    def __repr__(self):
+        if self._lazy_instance is None:
+            return "<LazyProxy (not created)>"
+        return repr(self._lazy_instance)
+
+    def __str__(self):
+        return str(self._lazy_target())
+
+    def __bool__(self):
+        return bool(self._lazy_target())
+
+    def __eq__(self, other):
+        return self._lazy_target() == other
+
+    def __hash__(self):
+        return hash(self._lazy_target())
+
+    def __call__(self, *args, **kwargs):
+        return self._lazy_target()(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._lazy_target())
+
+    def __iter__(self):
+        return iter(self._lazy_target())
+
+    def __contains__(self, item):
+        return item in self._lazy_target()
+
+    def __getitem__(self, key):
+        return self._lazy_target()[key]
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class _SampleStats:
+    # Running count/total/max plus a bounded uniform reservoir (algorithm R) for
+    # percentiles, so memory and report time do not grow with the number of samples
+    __slots__ = ("count", "total", "maximum", "reservoir", "capacity")
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.reservoir = array("d")
+        self.capacity = capacity
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        if len(self.reservoir) < self.capacity:
+            self.reservoir.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.capacity:
+                self.reservoir[index] = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        return _percentile(sorted(self.reservoir), fraction)
+
+
+class _ResolutionFrame:
+    __slots__ = ("interface", "path", "lifestyle", "constructed", "seconds", "child_seconds", "children")
+
+    def __init__(self, interface, path, lifestyle):
+        self.interface = interface
+        self.path = path
+        self.lifestyle = lifestyle
+        self.constructed = False
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.children = []
+
+    def to_dict(self):
+        return {
+            "interface": _name(self.interface),
+            "lifestyle": self.lifestyle.name,
+            "constructed": self.constructed,
+            "ms": self.seconds * 1000,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class ResolutionProfiler:
+    # Collects construction times per (interface, lifestyle), self time per resolution
+    # stack (folded flame-graph format), scope lifetimes and the last resolution tree
+    def __init__(self):
+        self.constructions = {}
+        self.folded = {}
+        self.scope_lifetimes = _SampleStats()
+        self.scope_instances = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def instrument_plan(self, interface, lifestyle, plan):
+        return lambda: self.resolve(interface, lifestyle, plan)
+
+    def instrument_construction(self, interface, lifestyle, create):
+        return lambda: self.construct(interface, lifestyle, create)
+
+    def resolve(self, interface, lifestyle, plan):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        frame = _ResolutionFrame(interface, parent.path + (interface,) if parent else (interface,), lifestyle)
+        if parent is not None:
+            parent.children.append(frame)
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return plan()
+        finally:
+            frame.seconds = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self.folded[frame.path] = self.folded.get(frame.path, 0.0) + frame.seconds - frame.child_seconds
+            if parent is not None:
+                parent.child_seconds += frame.seconds
+            else:
+                self._local.last_tree = frame
+
+    def construct(self, interface, lifestyle, create):
+        start = time.perf_counter()
+        instance = create()
+        elapsed = time.perf_counter() - start
+        stack = self._stack()
+        if stack and stack[-1].interface is interface:
+            stack[-1].constructed = True
+        key = (interface, lifestyle)
+        with self._lock:
+            samples = self.constructions.get(key)
+            if samples is None:
+                samples = self.constructions[key] = _SampleStats()
+            samples.add(elapsed)
+        return instance
+
+    def record_scope(self, lifetime, instances):
+        with self._lock:
+            self.scope_lifetimes.add(lifetime)
+            self.scope_instances += instances
+
+    def last_tree(self):
+        frame = getattr(self._local, "last_tree", None)
+        return frame.to_dict() if frame is not None else None
+
+    def report(self):
+        services = []
+        with self._lock:
+            constructions = list(self.constructions.items())
+        for (interface, lifestyle), samples in constructions:
+            services.append({
+                "interface": _name(interface),
+                "lifestyle": lifestyle.name,
+                "constructions": samples.count,
+                "total_ms": samples.total * 1000,
+                "mean_ms": samples.mean() * 1000,
+                "p99_ms": samples.percentile(0.99) * 1000,
+            })
+        services.sort(key=lambda item: item["total_ms"], reverse=True)
+        lifetimes = self.scope_lifetimes
+        scopes = {
+            "count": lifetimes.count,
+            "mean_ms": lifetimes.mean() * 1000,
+            "p99_ms": lifetimes.percentile(0.99) * 1000,
+            "max_ms": lifetimes.maximum * 1000,
+            "mean_instances": self.scope_instances / lifetimes.count if lifetimes.count else 0.0,
+        }
+        return {"services": services, "scopes": scopes}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.report(), indent=indent)
+
+    def to_folded(self):
+        # One "frame;frame;frame <self time in microseconds>" line per stack
+        lines = []
+        for path, self_seconds in self.folded.items():
+            frames = ";".join(_name(interface).replace(";", "_").replace(" ", "_") for interface in path)
+            lines.append(f"{frames} {max(0, round(self_seconds * 1e6))}")
+        return "\n".join(sorted(lines))
+
+
+_constructor_hints_cache = weakref.WeakKeyDictionary()
+
+
+def _constructor_hints(implementation):
+    # (parameter name, annotated type) pairs of the constructor, introspected once per implementation.
+    # Hints with unresolvable string annotations are not cached: the referenced
+    # class may be defined later, and the next lookup resolves it then.
+    try:
+        return _constructor_hints_cache[implementation]
+    except (KeyError, TypeError):
+        pass
+
+    target = implementation.__init__ if isinstance(implementation, type) else implementation
+    try:
+        parameters = inspect.signature(implementation).parameters.values()
+    except (TypeError, ValueError):
+        parameters = ()
+    resolved = True
+    try:
+        annotations = typing.get_type_hints(target)
+    except Exception:
+        annotations = getattr(target, "__annotations__", {})
+        resolved = False
+
+    keyword_kinds = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    hints = tuple(
+        (parameter.name, annotations[parameter.name])
+        for parameter in parameters
+        if parameter.kind in keyword_kinds and isinstance(annotations.get(parameter.name), type)
+    )
+    if resolved:
+        try:
+            _constructor_hints_cache[implementation] = hints
+        except TypeError:
+            pass
+    return hints
+
+
 class DependencyInjector:
     def __init__(self):
         self._registrations = {}
         self._singletons = {}
+        self._singleton_locks = {}
+        # Instances of SCOPED services resolved outside of any scope
         self._scoped_instances = {}
+        # Current scope of this container in the running thread or asyncio task
+        self._scope = ContextVar(f"di_scope_{id(self)}", default=None)
+        self._plans = {}
+        self._profiler = None
 
-    def register(self, interface, implementation=None, lifestyle=LifeStyle.PER_REQUEST, params=None):
-        self._registrations[interface] = {
+    def register(self, interface, implementation=None, lifestyle=LifeStyle.PER_REQUEST, params=None,
+                 autowire=False, lazy=False):
+        registration = {
             "impl": implementation,
             "lifestyle": lifestyle,
             "params": params or {},
-            "factory": None
+            "factory": None,
+            "autowire": autowire,
+            "lazy": lazy
         }
+        self._check_cycles(interface, registration)
+        self._registrations[interface] = registration
+        self._plans.clear()
 
     def register_factory(self, interface, factory_method):
         self._registrations[interface] = {
             "impl": None,
             "lifestyle": LifeStyle.PER_REQUEST,
             "params": {},
-            "factory": factory_method
+            "factory": factory_method,
+            "autowire": False,
+            "lazy": False
         }
+        self._plans.clear()
 
     def get_instance(self, interface):
+        plan = self._plans.get(interface)
+        if plan is None:
+            plan = self._compile(interface, ())
+        return plan()
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    # Plans are recompiled with instrumentation; while disabled they carry no profiling code
+    def enable_profiling(self, profiler=None):
+        self._profiler = profiler or self._profiler or ResolutionProfiler()
+        self._plans.clear()
+        return self._profiler
+
+    def disable_profiling(self):
+        profiler, self._profiler = self._profiler, None
+        self._plans.clear()
+        return profiler
+
+    def trace(self, interface):
+        # Resolves the interface once and returns (instance, resolution tree)
+        temporary = self._profiler is None
+        profiler = self.enable_profiling(ResolutionProfiler() if temporary else None)
+        try:
+            instance = self.get_instance(interface)
+            return instance, profiler.last_tree()
+        finally:
+            if temporary:
+                self.disable_profiling()
+
+    def _check_cycles(self, interface, registration):
+        # Depth-first search from the new registration over already registered dependencies
+        stack = [(interface, iter(self._dependencies(registration)))]
+        path = [interface]
+        visited = set()
+        while stack:
+            node, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency == interface:
+                    raise CircularDependencyError(path + [interface])
+                if dependency in visited or dependency not in self._registrations:
+                    continue
+                visited.add(dependency)
+                stack.append((dependency, iter(self._dependencies(self._registrations[dependency]))))
+                path.append(dependency)
+                break
+            else:
+                stack.pop()
+                path.pop()
+
+    @staticmethod
+    def _dependencies(registration):
+        params = registration["params"]
+        dependencies = [value for value in params.values() if isinstance(value, type)]
+        # An implementation given by import path is not introspected until it is imported
+        if registration["autowire"] and not isinstance(registration["impl"], str):
+            dependencies.extend(annotation for name, annotation in _constructor_hints(registration["impl"])
+                                if name not in params)
+        return dependencies
+
+    def _compile(self, interface, path):
+        if interface in path:
+            raise CircularDependencyError(path[path.index(interface):] + (interface,))
         if interface not in self._registrations:
             raise ValueError(f"Interface {interface} not registered")
 
         reg = self._registrations[interface]
         lifestyle = reg["lifestyle"]
+        profiler = self._profiler
+        if reg["lazy"]:
+            create = self._compile_lazy_constructor(interface, reg, path + (interface,))
+        else:
+            create = self._compile_constructor(interface, reg, path + (interface,))
+            if profiler is not None:
+                create = profiler.instrument_construction(interface, lifestyle, create)
 
         if lifestyle == LifeStyle.SINGLETON:
-            if interface not in self._singletons:
-                self._singletons[interface] = self._create_instance(interface)
-            return self._singletons[interface]
+            singletons = self._singletons
+            lock = self._singleton_locks.setdefault(interface, threading.Lock())
+
+            def plan():
+                instance = singletons.get(interface)
+                if instance is None:
+                    with lock:
+                        instance = singletons.get(interface)
+                        if instance is None:
+                            instance = singletons[interface] = create()
+                return instance
 
         elif lifestyle == LifeStyle.SCOPED:
-            if interface not in self._scoped_instances:
-                self._scoped_instances[interface] = self._create_instance(interface)
-            return self._scoped_instances[interface]
+            current_scope = self._scope.get
 
-        return self._create_instance(interface)
+            def plan():
+                scoped = current_scope()
+                if scoped is None:
+                    scoped = self._scoped_instances
+                instance = scoped.get(interface)
+                if instance is None:
+                    instance = scoped.setdefault(interface, create())
+                return instance
 
-    def _create_instance(self, interface):
-        reg = self._registrations[interface]
+        else:
+            plan = create
+
+        if profiler is not None:
+            plan = profiler.instrument_plan(interface, lifestyle, plan)
+        self._plans[interface] = plan
+        return plan
+
+    def _compile_lazy_constructor(self, interface, reg, path):
+        # The real constructor (and the import of its implementation) is compiled on first access
+        compiled = []
+        profiler = self._profiler
+
+        def materialize():
+            if not compiled:
+                create = self._compile_constructor(interface, reg, path)
+                if profiler is not None:
+                    create = profiler.instrument_construction(interface, reg["lifestyle"], create)
+                compiled.append(create)
+            return compiled[0]()
+
+        return lambda: LazyProxy(materialize)
+
+    def _compile_constructor(self, interface, reg, path):
         if reg["factory"]:
-            return reg["factory"]()
+            return reg["factory"]
 
+        if isinstance(reg["impl"], str):
+            reg["impl"] = _import_object(reg["impl"])
         impl = reg["impl"]
-        params = reg["params"]
+        params = dict(reg["params"])
+        if reg["autowire"]:
+            # Annotated constructor parameters of registered types, explicit params take precedence
+            for param_name, annotation in _constructor_hints(impl):
+                if param_name not in params and annotation in self._registrations:
+                    params[param_name] = annotation
 
-        constructor_args = {}
+        constants = {}
+        dependencies = []
         for param_name, param_value in params.items():
             if isinstance(param_value, type):  # Dependency
-                constructor_args[param_name] = self.get_instance(param_value)
+                plan = self._plans.get(param_value)
+                if plan is None:
+                    plan = self._compile(param_value, path)
+                dependencies.append((param_name, plan))
             else:
-                constructor_args[param_name] = param_value
+                constants[param_name] = param_value
+
+        if not dependencies:
+            if not constants:
+                return impl
+            return lambda: impl(**constants)
+
+        dependencies = tuple(dependencies)
 
-        return impl(**constructor_args)
+        def create():
+            constructor_args = constants.copy()
+            for param_name, plan in dependencies:
+                constructor_args[param_name] = plan()
+            return impl(**constructor_args)
+
+        return create
 
     @contextmanager
     def create_scope(self):
-        old_scope = self._scoped_instances.copy()
-        self._scoped_instances = {}
+        profiler = self._profiler
+        started = time.perf_counter() if profiler is not None else 0.0
+        scope = {}
+        token = self._scope.set(scope)
         try:
             yield self
         finally:
-            self._scoped_instances = old_scope
+            self._scope.reset(token)
+            if profiler is not None:
+                profiler.record_scope(time.perf_counter() - started, len(scope))
@@ -1,3 +1,5 @@
+import sys
+
 from di_container import DependencyInjector
 from di_projec.configuration import configure_debug, configure_release
 from di_projec.service3 import IService3
@@ -35,3 +37,6 @@ def main():
 
 if __name__ == "__main__":
     main()
+    if '--bench' in sys.argv:
+        from benchmark import run_benchmarks
+        run_benchmarks()